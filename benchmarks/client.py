@@ -0,0 +1,134 @@
+"""Throughput and allocations of the client's hot paths, run offline against
+synthetic fixtures replayed through a ReplayTransport.
+
+Run from the repository root:
+
+    python benchmarks/client.py [--fixtures recorded.json]
+
+With --fixtures, the end to end calls are replayed from responses recorded
+by a RecordingTransport instead (they need to include the synthetic keys).
+"""
+import gc
+import json
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), os.pardir))
+
+try:
+    import tracemalloc
+except ImportError:  # python 2, count the objects made instead
+    tracemalloc = None
+
+from pyptv.client import PTVClient  # noqa
+from pyptv.location import Location  # noqa
+from pyptv.replay import ReplayTransport, load_fixtures  # noqa
+from pyptv.stop import StopFactory  # noqa
+from pyptv.line import LineFactory  # noqa
+from pyptv.utils import parse_datetime_tz  # noqa
+
+import fixtures  # noqa
+
+
+def allocations(fn):
+    """Memory (bytes) allocated by one call of fn, or with no tracemalloc
+    the number of objects it left behind for the garbage collector to track.
+    """
+
+    if tracemalloc is not None:
+        tracemalloc.start()
+        result = fn()
+        size, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        del result
+        return peak, "bytes"
+
+    gc.collect()
+    gc.disable()
+    try:
+        before = len(gc.get_objects())
+        result = fn()
+        after = len(gc.get_objects())
+    finally:
+        gc.enable()
+    del result
+    return after - before, "objects"
+
+
+def bench(name, fn, items, repeat=3, min_time=0.2):
+    """ print the best of repeat runs, as items per second """
+
+    number = 1
+    while timeit.timeit(fn, number=number) < min_time:
+        number *= 2
+
+    best = min(timeit.repeat(fn, number=number, repeat=repeat)) / number
+    allocated, unit = allocations(fn)
+
+    print("%-36s %12.0f /s %10.1f us %10d %s" % (
+        name, items / best, best * 1e6, allocated, unit))
+
+
+def cases(client, responses):
+    raw = fixtures.departures(2809, 100)
+    body = json.dumps({"values": raw})
+    stop_details = [fixtures.stop(i) for i in range(100)]
+    line_details = [fixtures.line(i) for i in range(100)]
+    timestamps = ["2015-06-04T%02d:%02d:00Z" % (h, m)
+                  for h in range(10) for m in range(0, 60, 6)]
+    here = Location(-37.771141, 144.961599)
+    there = [Location(-37.77 + i * 0.001, 144.96 + i * 0.001)
+             for i in range(100)]
+    departures_paths = sorted(k for k in responses if "departures" in k)
+
+    def process_departures():
+        return client._process_departures(json.loads(body)["values"])
+
+    def stop_factory():
+        factory = StopFactory(client)
+        return [factory.create(**d) for d in stop_details]
+
+    def line_factory():
+        factory = LineFactory(client)
+        return [factory.create(**d) for d in line_details]
+
+    def parse_timestamps():
+        return [parse_datetime_tz(t) for t in timestamps]
+
+    def distances():
+        return [here.distance(loc) for loc in there]
+
+    def end_to_end():
+        stop_id = int(departures_paths[0].split("/")[5])
+        return client.broad_next_departures("tram", stop_id, limit=50)
+
+    def stops_nearby():
+        return client.stops_nearby((-37.77, 144.96))
+
+    return [("_process_departures (departures)", process_departures, 100),
+            ("StopFactory.create (stops)", stop_factory, 100),
+            ("LineFactory.create (lines)", line_factory, 100),
+            ("parse_datetime_tz (timestamps)", parse_timestamps, 100),
+            ("Location.distance (distances)", distances, 100),
+            ("broad_next_departures (calls)", end_to_end, 1),
+            ("stops_nearby (calls)", stops_nearby, 1),
+            ]
+
+
+def main(argv):
+    responses = fixtures.fixtures()
+    if "--fixtures" in argv:
+        responses.update(load_fixtures(argv[argv.index("--fixtures") + 1]))
+
+    client = PTVClient("1000000", "secret",
+                       transport=ReplayTransport(responses))
+
+    print("%-36s %15s %13s %17s" % ("benchmark", "throughput", "per call",
+                                    "allocated"))
+    for name, fn, items in cases(client, responses):
+        bench(name, fn, items)
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
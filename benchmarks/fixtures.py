@@ -0,0 +1,84 @@
+"""Synthetic API responses for the benchmarks, in the same shape as the real
+ones, keyed the way ReplayTransport looks them up.
+
+Write them to a file to replay elsewhere:
+
+    python benchmarks/fixtures.py fixtures.json
+"""
+import json
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), os.pardir))
+
+MODE_IDS = {"train": 0, "tram": 1, "bus": 2}
+
+
+def stop(stop_id, mode="tram"):
+    return {"transport_type": mode,
+            "stop_id": stop_id,
+            "location_name": "Stop %d/Sydney Rd #%d" % (stop_id, stop_id % 40),
+            "suburb": "Brunswick",
+            "lat": -37.77 + (stop_id % 97) * 0.001,
+            "lon": 144.96 + (stop_id % 89) * 0.001,
+            "distance": 0.0,
+            }
+
+
+def line(line_id, mode="tram"):
+    return {"transport_type": mode,
+            "line_id": line_id,
+            "line_name": "%d - North Coburg - City" % line_id,
+            "line_number": str(line_id),
+            }
+
+
+def departure(i, stop_id, mode="tram"):
+    minute = i % 60
+    hour = 5 + i // 60
+    realtime = None
+    if i % 3:
+        realtime = "2015-06-04T%02d:%02d:30Z" % (hour, minute)
+    return {"platform": {"realtime_id": 0,
+                         "stop": stop(stop_id, mode),
+                         "direction": {"linedir_id": 23,
+                                       "direction_id": 5,
+                                       "direction_name": "City",
+                                       "line": line(19 + i % 4, mode)}},
+            "run": {"transport_type": mode,
+                    "run_id": 1000 + i,
+                    "num_skipped": 0,
+                    "destination_id": 1,
+                    "destination_name": "Flinders St"},
+            "time_timetable_utc": "2015-06-04T%02d:%02d:00Z" % (hour, minute),
+            "time_realtime_utc": realtime,
+            "flags": "RR-E" if i % 5 == 0 else "E",
+            }
+
+
+def departures(stop_id, count, mode="tram"):
+    return [departure(i, stop_id, mode) for i in range(count)]
+
+
+def fixtures(stops=20, limit=50, mode="tram"):
+    """ {request key: body} for departures and nearme at a range of stops """
+
+    out = {}
+    mode_id = MODE_IDS[mode]
+    for stop_id in range(1, stops + 1):
+        path = "/v2/mode/%d/stop/%d/departures/by-destination/limit/%d" % (
+            mode_id, stop_id, limit)
+        out[path] = json.dumps({"values": departures(stop_id, limit, mode)})
+
+    nearme = [{"result": stop(stop_id, mode), "type": "stop"}
+              for stop_id in range(1, 31)]
+    out["/v2/nearme/latitude/-37.77/longitude/144.96"] = json.dumps(nearme)
+
+    return out
+
+
+if __name__ == '__main__':
+    if len(sys.argv) != 2:
+        sys.exit("usage: python benchmarks/fixtures.py <file>")
+    with open(sys.argv[1], 'w') as f:
+        json.dump(fixtures(), f, indent=1, sort_keys=True)
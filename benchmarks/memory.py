@@ -0,0 +1,79 @@
+"""Bytes per entity for the model classes, compared with the same objects
+backed by an instance __dict__ (how they were stored before __slots__).
+
+Run from the repository root:
+
+    python benchmarks/memory.py
+"""
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), os.pardir))
+
+from pyptv.direction import Direction  # noqa
+from pyptv.line import TramLine  # noqa
+from pyptv.outlet import RetailOutlet  # noqa
+from pyptv.platform_ import Platform  # noqa
+from pyptv.run import TramRun  # noqa
+from pyptv.stop import TramStop  # noqa
+
+
+class DictBacked(object):
+    """ stand in for a model object that keeps its attributes in __dict__ """
+
+
+def attributes(obj):
+    names = []
+    for klass in type(obj).__mro__:
+        names.extend(getattr(klass, '__slots__', ()))
+    return [name for name in names
+            if not name.startswith('__') and hasattr(obj, name)]
+
+
+def footprint(obj):
+    """ size of an object and its attribute storage, not what it points to """
+    size = sys.getsizeof(obj)
+    if hasattr(obj, '__dict__'):
+        size += sys.getsizeof(obj.__dict__)
+    return size
+
+
+def dict_backed(obj):
+    twin = DictBacked()
+    for name in attributes(obj):
+        setattr(twin, name, getattr(obj, name))
+    return twin
+
+
+def samples():
+    line = TramLine(line_id=1881, line_name="19 - North Coburg - City",
+                    line_number="19")
+    line._client = None
+    stop = TramStop(lat=-37.771141, lon=144.961599,
+                    location_name="Glenlyon Rd/Sydney Rd #21", stop_id=2809,
+                    suburb="Brunswick", distance=0)
+    stop._client = None
+    direction = Direction(direction_id=5, direction_name="City", line=line,
+                          linedir_id=23)
+    platform = Platform(direction=direction, stop=stop, realtime_id=0)
+    run = TramRun(destination_id=1, destination_name="Flinders St",
+                  num_skipped=0, run_id=-1)
+    run._client = None
+    outlet = RetailOutlet(lat=-37.77, lon=144.96, location_name="7-Eleven",
+                          suburb="Brunswick", business_name="7-Eleven",
+                          distance=0)
+    outlet._client = None
+    return [stop.location, line, stop, direction, platform, run, outlet]
+
+
+def main():
+    print("%-12s %8s %8s %8s" % ("entity", "before", "after", "saved"))
+    for obj in samples():
+        before = footprint(dict_backed(obj))
+        after = footprint(obj)
+        print("%-12s %8d %8d %7d%%" % (type(obj).__name__, before, after,
+                                       100 * (before - after) / before))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,120 @@
+"""Speed of building signed request urls with RequestSigner, compared with
+parsing, encoding and signing every request from scratch, and a check that
+both make byte for byte the same urls.
+
+Run from the repository root:
+
+    python benchmarks/signing.py
+"""
+from datetime import datetime
+import hmac
+from hashlib import sha1
+import os
+import sys
+import timeit
+import urllib
+import urlparse
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), os.pardir))
+
+from pyptv.client import API_BASE_URL, BROAD_DEPARTURES_PATH  # noqa
+from pyptv.signing import RequestSigner  # noqa
+
+DEVELOPER_ID = "1000000"
+API_KEY = "9c132d31-6a30-4cac-8d8b-8a1970834799"
+
+# a fixed time, so that both build the same timestamp
+NOW = 1433396040.25
+
+PATHS = ["/v2/healthcheck",
+         "/v2/nearme/latitude/-37.771141/longitude/144.961599",
+         "/v2/nearme/latitude/-37.77114123456789/longitude/144.9",
+         "/v2/mode/1/stop/2809/departures/by-destination/limit/5",
+         "/v2/mode/0/line/1/stop/1071/directionid/0/departures/all/limit/5"
+         "?for_utc=2015-06-04T05:34:00Z",
+         "/v2/mode/1/run/123/stop/2809/stopping-pattern?for_utc=2015-06-04",
+         "/v2/lines/mode/1?name=Sydney Rd",
+         "/v2/lines/mode/1?name=a&name=b&empty=",
+         "/v2/search/%s" % urllib.quote("Brunswick Town Hall/Sydney Rd"),
+         "/v2/poi/0,1,100/lat1/-37.7/long1/144.9/lat2/-37.8/long2/145.0/"
+         "griddepth/3/limit/20",
+         "/v2/disruptions/modes/general,metro-train",
+         "/v2/odd;params/path?x=1#fragment",
+         ]
+
+
+def reference_signed_url(api_path, timed=True, base_url=API_BASE_URL,
+                         developer_id=DEVELOPER_ID, api_key=API_KEY):
+    """ how PTVClient._signed_url built urls before RequestSigner """
+
+    parsed = urlparse.urlparse(api_path)
+    query = urlparse.parse_qsl(parsed.query)
+    if timed:
+        now = datetime.utcfromtimestamp(NOW).replace(
+            microsecond=0).isoformat() + 'Z'
+        query.append(('timestamp', now))
+    query.append(('devid', developer_id))
+
+    unsigned_query = urllib.urlencode(query)
+    unsigned_parsed = parsed._replace(query=unsigned_query)
+    unsigned_path = unsigned_parsed.geturl()
+
+    digest = hmac.new(api_key, unsigned_path, sha1)
+    signature = digest.hexdigest()
+
+    query.append(('signature', signature))
+    signed_query = urllib.urlencode(query)
+    signed_parsed = unsigned_parsed._replace(query=signed_query)
+    signed_path = signed_parsed.geturl()
+
+    return urlparse.urljoin(base_url, signed_path)
+
+
+def check(signer):
+    mismatches = 0
+    for path in PATHS:
+        for timed in (True, False):
+            expected = reference_signed_url(path, timed, signer.base_url)
+            got = signer.signed_url(path, timed)
+            if got != expected:
+                mismatches += 1
+                print("MISMATCH %s\n  expected %s\n  got      %s" % (
+                    path, expected, got))
+    return mismatches
+
+
+def main():
+    signer = RequestSigner(DEVELOPER_ID, API_KEY, API_BASE_URL,
+                           clock=lambda: NOW)
+
+    mismatches = check(signer)
+    mismatches += check(RequestSigner(DEVELOPER_ID, API_KEY,
+                                      "http://127.0.0.1:8000/api/",
+                                      clock=lambda: NOW))
+    print("%d urls checked, %d mismatches" % (len(PATHS) * 4, mismatches))
+
+    path = PATHS[3]
+    number = 20000
+    cases = [
+        ("format base path",
+         lambda: ("/v2/mode/{mode}/stop/{stop}/"
+                  "departures/by-destination/limit/{limit}").format(
+             mode=1, stop=2809, limit=5)),
+        ("PathTemplate.render",
+         lambda: BROAD_DEPARTURES_PATH.render(1, 2809, 5)),
+        ("reference signed url", lambda: reference_signed_url(path)),
+        ("RequestSigner.signed_url", lambda: signer.signed_url(path)),
+        ("reference, with query", lambda: reference_signed_url(PATHS[4])),
+        ("RequestSigner, with query", lambda: signer.signed_url(PATHS[4])),
+    ]
+    print("%-28s %10s" % ("", "us / call"))
+    for name, fn in cases:
+        best = min(timeit.repeat(fn, number=number, repeat=3)) / number
+        print("%-28s %10.2f" % (name, best * 1e6))
+
+    if mismatches:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
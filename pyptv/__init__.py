@@ -1,4 +1,20 @@
 from pyptv.location import Location
 from pyptv.client import PTVClient
+from pyptv.async_client import AsyncPTVClient
+from pyptv.transport import HTTPTransport
+from pyptv.cache import ResponseCache
+from pyptv.ratelimit import RateLimiter
+from pyptv.identity import IdentityMap
+from pyptv.journey import TransitGraph
+from pyptv.resilience import Resilience
+from pyptv.instrument import Instrumentation
+from pyptv.board import DepartureBoard
+from pyptv.disruption_tracker import DisruptionTracker
+from pyptv.poi_tiles import POITiles
+from pyptv.exceptions import PTVError, APIError, CircuitOpenError
 
-__all__ = ["PTVClient", "Location"]
+__all__ = ["PTVClient", "AsyncPTVClient", "Location", "HTTPTransport",
+           "ResponseCache", "RateLimiter", "IdentityMap", "TransitGraph",
+           "Resilience", "Instrumentation", "DepartureBoard",
+           "DisruptionTracker", "POITiles", "PTVError", "APIError",
+           "CircuitOpenError"]
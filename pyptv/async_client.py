@@ -0,0 +1,93 @@
+from multiprocessing.pool import ThreadPool
+
+from pyptv.client import PTVClient
+from pyptv.transport import HTTPTransport
+
+
+def _concurrent(name):
+    """Wrap a blocking PTVClient API method so it runs on the client's pool"""
+
+    blocking = getattr(PTVClient, name)
+
+    def method(self, *args, **kwargs):
+        return self.run_async(blocking, self, *args, **kwargs)
+
+    method.__name__ = name + "_async"
+    method.__doc__ = "Like %s, but returns an AsyncResult straight away.\n" \
+        % name + (blocking.__doc__ or "")
+    return method
+
+
+class AsyncPTVClient(PTVClient):
+    """A PTVClient with a version of each API method that returns
+    immediately.
+
+    The API methods block the same as PTVClient's, so anything built on the
+    client works unchanged. Each also has an *_async version, e.g.
+    broad_next_departures_async, that returns an AsyncResult straight away,
+    call .get() on it (or pass a list of them to gather) to wait for the
+    parsed response. Those requests are sent concurrently on a pool of
+    workers, and the transport caps how many are in flight at once.
+
+    Objects created by this client have *_async versions of their methods
+    that call it too, e.g. TramStop.broad_next_departures_async() and
+    TramLine.stops_async().
+
+    Response parsing is the same as PTVClient.
+
+    Arguments:
+        concurrency: number of requests that can be in flight at once
+        (the rest are the same as PTVClient)
+    """
+
+    CONCURRENT_METHODS = ("healthcheck",
+                          "stops_nearby",
+                          "transport_pois_by_map",
+                          "search",
+                          "lines_by_mode",
+                          "stops_on_a_line",
+                          "broad_next_departures",
+                          "specific_next_departures",
+                          "specific_next_departures_gtfs",
+                          "stopping_pattern",
+                          "disruptions",
+                          )
+
+    def __init__(self, developer_id=None, api_key=None, transport=None,
+                 cache=None, concurrency=32, **kwargs):
+
+        if transport is None:
+            transport = HTTPTransport(pool_size=concurrency,
+                                      max_in_flight=concurrency)
+
+        super(AsyncPTVClient, self).__init__(developer_id=developer_id,
+                                             api_key=api_key,
+                                             transport=transport,
+                                             cache=cache,
+                                             **kwargs)
+
+        self.concurrency = concurrency
+        self._pool = ThreadPool(concurrency)
+
+    def run_async(self, fn, *args, **kwargs):
+        """Call fn(*args, **kwargs) on the pool and return an AsyncResult"""
+        # the pool's threads don't see this one's request_priority
+        return self._pool.apply_async(
+            self._with_priority, (self.current_priority(), fn) + args, kwargs)
+
+    def close(self):
+        """Wait for outstanding requests and shut down the workers"""
+        self._pool.close()
+        self._pool.join()
+        super(AsyncPTVClient, self).close()
+
+
+for _name in AsyncPTVClient.CONCURRENT_METHODS:
+    setattr(AsyncPTVClient, _name + "_async", _concurrent(_name))
+
+
+def gather(results, timeout=None):
+    """Wait for a list of AsyncResults and return their values in order.
+    Raises the first error encountered.
+    """
+    return [result.get(timeout) for result in results]
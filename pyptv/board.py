@@ -0,0 +1,270 @@
+from bisect import bisect_left, insort
+import calendar
+from collections import namedtuple, OrderedDict
+import itertools
+import threading
+import time
+
+from pyptv.watcher import departure_time
+
+
+class BoardSnapshot(namedtuple("BoardSnapshot", ["version", "refreshed_at",
+                                                 "departures", "errors"])):
+    """What a DepartureBoard showed after a refresh. departures is a tuple
+    of the next departures across all its stops & platforms, soonest first.
+    errors maps sources that failed to refresh to their exception (their
+    departures from the last successful refresh are still shown).
+
+    Snapshots are never changed once published, so readers can hold onto
+    one without locking.
+    """
+    __slots__ = ()
+
+
+def _epoch(dt):
+    return calendar.timegm(dt.utctimetuple())
+
+
+def source_key(source):
+    """ key of a Stop or Platform on a board """
+    if hasattr(source, 'direction'):
+        return ('platform', source.stop.transport_type, source.stop.stop_id,
+                source.direction.line.line_id, source.direction.direction_id)
+    return ('stop', source.transport_type, source.stop_id)
+
+
+class DepartureBoard(object):
+    """The next departures from any of a set of stops and platforms, across
+    modes, merged and sorted by realtime (or else timetabled) time.
+
+    Each refresh fetches every source concurrently. Departures are kept in
+    one sorted structure that only the sources whose departures changed are
+    updated in, and the front of it is published as an immutable
+    BoardSnapshot (see snapshot & subscribe).
+
+    Arguments:
+        client: PTVClient to fetch departures with
+        stops: Stops to show all departures from
+        platforms: Platforms (a line and direction at a stop) to show
+            departures from
+        limit: departures to fetch per stop or platform
+        size: (optional) departures to show, defaults to all of them
+        workers: number of requests to send at once
+        grace: seconds to keep showing a departure after it's due
+    """
+
+    def __init__(self, client, stops=(), platforms=(), limit=5, size=None,
+                 workers=8, grace=60):
+        self.client = client
+        self.limit = limit
+        self.size = size
+        self.workers = workers
+        self.grace = grace
+
+        self._sources = OrderedDict()
+        # sorted (departure epoch, seq) of every departure on the board
+        self._entries = []
+        self._rows = {}
+        # source key -> (signature of its departures, its entries)
+        self._by_source = {}
+        self._seq = itertools.count()
+        self._errors = {}
+        self._lock = threading.Lock()
+
+        self._snapshot = BoardSnapshot(0, None, (), {})
+        self._subscribers = []
+        self._thread = None
+        self._stopped = threading.Event()
+        # the last exception raised by a background refresh (including by a
+        # subscriber), or None
+        self.last_error = None
+
+        for stop in stops:
+            self.add(stop)
+        for platform in platforms:
+            self.add(platform)
+
+    def __len__(self):
+        return len(self._sources)
+
+    def add(self, source):
+        """ start showing departures from a Stop or Platform """
+        with self._lock:
+            self._sources[source_key(source)] = source
+
+    def remove(self, source):
+        """ stop showing departures from a Stop or Platform """
+        key = source_key(source)
+        with self._lock:
+            self._sources.pop(key, None)
+            self._errors.pop(key, None)
+            self._replace(key, None, [])
+            snapshot = self._publish(force=True)
+        self._notify(snapshot)
+
+    def snapshot(self):
+        """ the BoardSnapshot published by the last refresh """
+        return self._snapshot
+
+    def subscribe(self, callback):
+        """ call callback(snapshot) with each new BoardSnapshot """
+        self._subscribers.append(callback)
+
+    def unsubscribe(self, callback):
+        self._subscribers.remove(callback)
+
+    def _fetch(self, source):
+        if hasattr(source, 'direction'):
+            direction = source.direction
+            return self.client.specific_next_departures(
+                mode=source.stop.transport_type,
+                line=direction.line.line_id, stop=source.stop.stop_id,
+                direction=direction.direction_id, limit=self.limit)
+        return self.client.broad_next_departures(
+            mode=source.transport_type, stop=source.stop_id,
+            limit=self.limit)
+
+    def refresh(self):
+        """Fetch departures from every source and publish a new snapshot if
+        anything changed.
+
+        Returns:
+            the current BoardSnapshot
+        """
+
+        with self._lock:
+            jobs = list(self._sources.items())
+
+        changed = False
+        for key, departures, error in self.client._fan_out(
+                self._fetch, jobs, self.workers):
+            with self._lock:
+                if key not in self._sources:
+                    continue  # removed while it was being fetched
+                if error is not None:
+                    # only a source starting to fail changes the board
+                    changed |= key not in self._errors
+                    self._errors[key] = error
+                    continue
+                if self._errors.pop(key, None) is not None:
+                    changed = True
+                changed |= self._update(key, departures)
+
+        with self._lock:
+            snapshot = self._publish(force=changed)
+        self._notify(snapshot)
+
+        return self._snapshot
+
+    def _update(self, key, departures):
+        """Replace a source's departures, returning False without touching
+        anything if they're the same as last time.
+        """
+
+        signature = tuple((departure["run"].run_id, departure_time(departure),
+                           departure["flags"]) for departure in departures)
+        old = self._by_source.get(key)
+        if old is not None and old[0] == signature:
+            return False
+
+        self._replace(key, signature, departures)
+        return True
+
+    def _replace(self, key, signature, departures):
+        entries = self._entries
+        rows = self._rows
+
+        old = self._by_source.pop(key, None)
+        if old is not None:
+            for entry in old[1]:
+                del entries[bisect_left(entries, entry)]
+                del rows[entry[1]]
+
+        if signature is None:
+            return
+
+        new = []
+        for departure in departures:
+            entry = (_epoch(departure_time(departure)), next(self._seq))
+            insort(entries, entry)
+            rows[entry[1]] = departure
+            new.append(entry)
+        self._by_source[key] = (signature, new)
+
+    def _publish(self, force=False):
+        """Publish the front of the board as a new snapshot, if it changed or
+        its first departure has gone, and return it (or None).
+        """
+
+        cutoff = time.time() - self.grace
+        current = self._snapshot
+        if not force and not (
+                current.departures and
+                _epoch(departure_time(current.departures[0])) < cutoff):
+            return None
+
+        entries = self._entries
+        rows = self._rows
+
+        out = []
+        seen = set()
+        i = bisect_left(entries, (cutoff,))
+        while i < len(entries) and (self.size is None or
+                                    len(out) < self.size):
+            departure = rows[entries[i][1]]
+            i += 1
+            # the same run at the same stop may be on the board from both
+            # the stop and one of its platforms
+            run = departure["run"]
+            seen_key = (run.transport_type, run.run_id,
+                        departure["platform"].stop.stop_id)
+            if seen_key in seen:
+                continue
+            seen.add(seen_key)
+            out.append(departure)
+
+        snapshot = BoardSnapshot(current.version + 1, time.time(),
+                                 tuple(out), dict(self._errors))
+        self._snapshot = snapshot
+        return snapshot
+
+    def _notify(self, snapshot):
+        if snapshot is None:
+            return
+        for callback in list(self._subscribers):
+            callback(snapshot)
+
+    # refreshing in the background
+
+    def start(self, interval=30):
+        """Refresh every interval seconds on a background thread. Anything a
+        refresh raises is kept in last_error rather than stopping the thread.
+        """
+
+        if self._thread is not None:
+            return
+
+        self._stopped.clear()
+
+        def run():
+            while True:
+                try:
+                    self.refresh()
+                except Exception as e:
+                    # keep the board refreshing, but keep the error to look at
+                    self.last_error = e
+                self._stopped.wait(interval)
+                if self._stopped.is_set():
+                    return
+
+        self._thread = threading.Thread(target=run)
+        self._thread.daemon = True
+        self._thread.start()
+
+    def stop(self):
+        """ stop refreshing in the background """
+        if self._thread is None:
+            return
+        self._stopped.set()
+        self._thread.join()
+        self._thread = None
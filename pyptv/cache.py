@@ -0,0 +1,144 @@
+from collections import OrderedDict
+import threading
+import time
+
+
+MINUTE = 60
+HOUR = 60 * MINUTE
+DAY = 24 * HOUR
+
+# seconds that a response from each API end point stays fresh for
+DEFAULT_TTLS = {"healthcheck": 0,
+                "stops_nearby": DAY,
+                "transport_pois_by_map": DAY,
+                "search": HOUR,
+                "lines_by_mode": DAY,
+                "stops_on_a_line": DAY,
+                "broad_next_departures": 15,
+                "specific_next_departures": 15,
+                "specific_next_departures_gtfs": 15,
+                "stopping_pattern": 30,
+                "disruptions": 5 * MINUTE,
+                }
+
+
+class ResponseCache(object):
+    """In-process cache of raw API responses.
+
+    Responses are keyed on the unsigned api path, so the timestamp and
+    signature don't defeat the cache. Each end point has its own time to
+    live and the least recently used responses are evicted once the cache
+    holds more than max_bytes.
+
+    Expired responses are kept for another stale_for seconds (while there's
+    room), to fall back on when the API is failing, see get_stale.
+
+    Arguments:
+        max_bytes: memory budget for cached response bodies
+        ttls: (optional) mapping of end point name to seconds, overriding
+            DEFAULT_TTLS
+        default_ttl: seconds to cache end points without a ttl, 0 disables
+            caching for them
+        stale_for: seconds after expiring that a response can still be
+            served by get_stale
+    """
+
+    def __init__(self, max_bytes=32 * 1024 * 1024, ttls=None, default_ttl=0,
+                 stale_for=HOUR):
+        self.max_bytes = max_bytes
+        self.ttls = dict(DEFAULT_TTLS)
+        if ttls is not None:
+            self.ttls.update(ttls)
+        self.default_ttl = default_ttl
+        self.stale_for = stale_for
+
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._size = 0
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def ttl_for(self, endpoint):
+        return self.ttls.get(endpoint, self.default_ttl)
+
+    def get(self, key):
+        """Return the cached body for this key, or None if there isn't a
+        fresh one.
+        """
+
+        with self._lock:
+            entry = self._entries.pop(key, None)
+            if entry is None:
+                self.misses += 1
+                return None
+
+            expires, body = entry
+            now = time.time()
+            if expires < now:
+                if expires + self.stale_for < now:
+                    self._size -= len(key) + len(body)
+                else:
+                    # keep it around to serve stale
+                    self._entries[key] = entry
+                self.expirations += 1
+                self.misses += 1
+                return None
+
+            # re-insert as the most recently used
+            self._entries[key] = entry
+            self.hits += 1
+            return body
+
+    def get_stale(self, key):
+        """Return the cached body for this key even if it has expired, as
+        long as it's no more than stale_for seconds past it, or None.
+        """
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires, body = entry
+            if expires + self.stale_for < time.time():
+                return None
+            return body
+
+    def set(self, endpoint, key, body):
+        ttl = self.ttl_for(endpoint)
+        size = len(key) + len(body)
+        if not ttl or size > self.max_bytes:
+            return
+
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._size -= len(key) + len(old[1])
+
+            self._entries[key] = (time.time() + ttl, body)
+            self._size += size
+
+            while self._size > self.max_bytes:
+                old_key, (_, old_body) = self._entries.popitem(last=False)
+                self._size -= len(old_key) + len(old_body)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._size = 0
+
+    def stats(self):
+        with self._lock:
+            return {"entries": len(self._entries),
+                    "bytes": self._size,
+                    "hits": self.hits,
+                    "misses": self.misses,
+                    "evictions": self.evictions,
+                    "expirations": self.expirations,
+                    }
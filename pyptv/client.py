@@ -1,27 +1,55 @@
 #!/usr/bin/env python
 
-from datetime import datetime
-import hmac
-from hashlib import sha1
+from contextlib import contextmanager
+import itertools
 import json
-import urlparse  # TODO: remove in favour of better lib
+from multiprocessing.pool import ThreadPool
+import Queue
+import threading
 import urllib
 
-import requests
-
-from pyptv.platform_ import Platform  # don't clobber the builtin platform
-from pyptv.direction import Direction
 from pyptv.stop import StopFactory
 from pyptv.line import LineFactory
 from pyptv.run import RunFactory
 from pyptv.outlet import OutletFactory
 from pyptv.disruption import DisruptionFactory
 from pyptv.location import parse_location
-from pyptv.utils import parse_datetime_tz
+from pyptv.transport import HTTPTransport
+from pyptv.spatial import StopIndex
+from pyptv.search_index import SearchIndex
+from pyptv.snapshot import NetworkSnapshot
+from pyptv.coalesce import SingleFlight
+from pyptv.ratelimit import ENDPOINT_PRIORITIES, BACKGROUND
+from pyptv.columnar import departure_columns
+from pyptv.departure import Departure, build_platform, build_flags, build_time
+from pyptv.exceptions import APIError
+from pyptv import instrument
+from pyptv.instrument import instrumented, timer
+from pyptv.signing import PathTemplate, RequestSigner
 
 
 API_BASE_URL = "http://timetableapi.ptv.vic.gov.au/"
 
+# api paths of the end points, see PathTemplate
+NEARME_PATH = PathTemplate("/v2/nearme/latitude/{lat}/longitude/{lon}")
+POI_PATH = PathTemplate("/v2/poi/{poi}/lat1/{lat1}/long1/{lon1}/"
+                        "lat2/{lat2}/long2/{lon2}/"
+                        "griddepth/{griddepth}/limit/{limit}")
+LINES_PATH = PathTemplate("/v2/lines/mode/{mode}")
+LINE_STOPS_PATH = PathTemplate("/v2/mode/{mode}/line/{line}/stops-for-line")
+BROAD_DEPARTURES_PATH = PathTemplate("/v2/mode/{mode}/stop/{stop}/"
+                                     "departures/by-destination/"
+                                     "limit/{limit}")
+SPECIFIC_DEPARTURES_PATH = PathTemplate("/v2/mode/{mode}/line/{line}/"
+                                        "stop/{stop}/directionid/{direction}/"
+                                        "departures/all/limit/{limit}")
+GTFS_DEPARTURES_PATH = PathTemplate("/v2/mode/{mode}/route_id/{route_id}/"
+                                    "stop/{stop}/direction/{direction}/"
+                                    "departures/all/limit/{limit}")
+STOPPING_PATTERN_PATH = PathTemplate("/v2/mode/{mode}/run/{run}/"
+                                     "stop/{stop}/stopping-pattern")
+DISRUPTIONS_PATH = PathTemplate("/v2/disruptions/modes/{modes}")
+
 
 class PTVClient(object):
     MODES = {"train":      0,
@@ -44,64 +72,259 @@ class PTVClient(object):
              "SS": "School days only",
              }
 
-    def __init__(self, developer_id=None, api_key=None):
+    def __init__(self, developer_id=None, api_key=None, transport=None,
+                 cache=None, stop_index=None, search_index=None,
+                 snapshot=None, coalesce=True,
+                 rate_limiter=None, identity_map=None, lazy_departures=False,
+                 base_url=API_BASE_URL, resilience=None,
+                 instrumentation=None, poi_tiles=None):
+        """
+        Arguments:
+            developer_id: your assigned developer id
+            api_key: your assigned api key
+            transport: (optional) object with a get(url) method returning the
+                raw response body. Defaults to a pooled HTTPTransport
+            cache: (optional) a ResponseCache to serve repeated calls from
+            stop_index: (optional) a StopIndex to answer stops_nearby from
+            search_index: (optional) a SearchIndex to answer search from
+            snapshot: (optional) a NetworkSnapshot to answer lines_by_mode
+                and stops_on_a_line from
+            coalesce: (optional) share one request between concurrent calls
+                for the same api path
+            rate_limiter: (optional) a RateLimiter that requests to the API
+                must get a token from first
+            identity_map: (optional) an IdentityMap, so that the same line or
+                stop is always the same object across responses
+            lazy_departures: (optional) return departures as Departure
+                objects, which only parse what is looked at
+            base_url: (optional) where the API is, e.g. a local MockPTVServer
+            resilience: (optional) a Resilience to retry, hedge & circuit
+                break requests with, and serve stale cached responses from
+                when the API is failing
+            instrumentation: (optional) an Instrumentation to record the
+                timings, sizes and outcomes of API calls with
+            poi_tiles: (optional) a POITiles to answer transport_pois_by_map
+                from points of interest cached one map tile at a time
+        """
 
         self.developer_id = developer_id
         self.api_key = api_key
 
-    def _api_request(self, api_path, timed=True):
-        """Call some api end point and return the raw response.
-        API request will have proper signing key appended.
+        if transport is None:
+            transport = HTTPTransport()
+        self.transport = transport
+        self.cache = cache
+        self.stop_index = stop_index
+        self.search_index = search_index
+        self.snapshot = snapshot
+        self.coalescer = SingleFlight() if coalesce else None
+        self.rate_limiter = rate_limiter
+        self.identity_map = identity_map
+        self.lazy_departures = lazy_departures
+        self.base_url = base_url
+        self.resilience = resilience
+        self.instrumentation = instrumentation
+        self.poi_tiles = poi_tiles
+        self._signer = None
+        self._local = threading.local()
+        # workers for the *_many methods, created when first needed
+        self._fan_out_pool = None
+        self._fan_out_size = 0
+        self._fan_out_lock = threading.Lock()
+
+    def _signed_url(self, api_path, timed=True):
+        """Full url for an api path, with the timestamp, developer id and
+        signature appended.
         """
 
-        parsed = urlparse.urlparse(api_path)
-
-        # parse out current query
-        query = urlparse.parse_qsl(parsed.query)
-
-        # add timestamp
-        if timed:
-            now = datetime.utcnow().replace(microsecond=0).isoformat() + 'Z'
-            query.append(('timestamp', now))
-
-        # add developer id
-        query.append(('devid', self.developer_id))
-
-        unsigned_query = urllib.urlencode(query)
-        unsigned_parsed = parsed._replace(query=unsigned_query)
-
-        unsigned_path = unsigned_parsed.geturl()
-
-        digest = hmac.new(self.api_key, unsigned_path, sha1)
+        # the signer pre-computes what it can from the credentials, so is
+        # replaced if they change
+        signer = self._signer
+        if signer is None or signer.credentials != (self.developer_id,
+                                                    self.api_key,
+                                                    self.base_url):
+            signer = self._signer = RequestSigner(self.developer_id,
+                                                  self.api_key,
+                                                  self.base_url)
+
+        return signer.signed_url(api_path, timed)
+
+    def _send(self, api_path, timed=True, priority=BACKGROUND,
+              endpoint=None):
+        """ send a signed request and return the raw response body """
+
+        if self.rate_limiter is not None:
+            self.rate_limiter.acquire(priority)
+
+        inst = self.instrumentation
+        if inst is None:
+            content = self.transport.get(self._signed_url(api_path, timed))
+        else:
+            start = timer()
+            url = self._signed_url(api_path, timed)
+            signed = timer()
+            inst.phase(endpoint, instrument.SIGN, signed - start)
+            try:
+                content = self.transport.get(url)
+            except Exception:
+                inst.outcome(endpoint, instrument.ATTEMPT_ERROR)
+                raise
+            inst.phase(endpoint, instrument.TRANSFER, timer() - signed)
+            inst.size(endpoint, len(content))
+
+        # every end point answers with a JSON object or array, anything else
+        # is an error page from somewhere along the way
+        if content[:64].lstrip()[:1] not in ('{', '['):
+            if inst is not None:
+                inst.outcome(endpoint, instrument.ATTEMPT_ERROR)
+            raise APIError("API response isn't JSON", body=content[:1024])
+
+        return content
+
+    def _fetch(self, api_path, timed=True, priority=BACKGROUND,
+               endpoint=None):
+        """ _send, through the resilience layer if there is one """
+
+        if self.resilience is not None:
+            return self.resilience.call(endpoint, self._send, api_path, timed,
+                                        priority, endpoint)
+        return self._send(api_path, timed, priority, endpoint)
+
+    def _stale(self, api_path):
+        """ an expired cached response to fall back on, or None """
+
+        resilience = self.resilience
+        if resilience is None or not resilience.serve_stale or \
+                self.cache is None:
+            return None
+
+        content = self.cache.get_stale(api_path)
+        if content is not None:
+            resilience.served_stale()
+        return content
+
+    @contextmanager
+    def request_priority(self, priority):
+        """Send the requests made by this thread inside the with block at a
+        given priority, rather than the end point's default. Requests that
+        the client sends on other threads for them (the *_many methods, and
+        AsyncPTVClient's *_async methods) get the same priority.
+
+            with client.request_priority(ratelimit.BULK):
+                client.broad_next_departures('tram', 2809)
+        """
 
-        signature = digest.hexdigest()
+        previous = getattr(self._local, 'priority', None)
+        self._local.priority = priority
+        try:
+            yield
+        finally:
+            self._local.priority = previous
+
+    def current_priority(self):
+        """ the priority set by request_priority on this thread, or None """
+        return getattr(self._local, 'priority', None)
+
+    def _with_priority(self, priority, fn, *args, **kwargs):
+        """ call fn on this thread at a priority captured from another """
+        if priority is None:
+            return fn(*args, **kwargs)
+        with self.request_priority(priority):
+            return fn(*args, **kwargs)
+
+    def _api_request(self, api_path, timed=True, endpoint=None):
+        """Call some api end point and return the raw response.
+        API request will have proper signing key appended.
 
-        query.append(('signature', signature))
-        signed_query = urllib.urlencode(query)
-        signed_parsed = unsigned_parsed._replace(query=signed_query)
+        endpoint names the API method making the call, which decides how long
+        its response may be cached for and its priority with the rate
+        limiter.
+        """
 
-        signed_path = signed_parsed.geturl()
+        inst = self.instrumentation
+        if inst is not None:
+            start = timer()
+            try:
+                return self._request(api_path, timed, endpoint, inst)
+            finally:
+                inst.requested(timer() - start)
+
+        return self._request(api_path, timed, endpoint)
+
+    def _request(self, api_path, timed, endpoint, inst=None):
+        """ _api_request, recording what happens to inst if there is one """
+
+        cache = self.cache
+        if cache is not None:
+            content = cache.get(api_path)
+            if content is not None:
+                if inst is not None:
+                    inst.outcome(endpoint, instrument.CACHE_HIT)
+                return self._decode(content, endpoint, inst)
+            if inst is not None:
+                inst.outcome(endpoint, instrument.CACHE_MISS)
+
+        priority = self.current_priority()
+        if priority is None:
+            priority = ENDPOINT_PRIORITIES.get(endpoint, BACKGROUND)
+
+        # concurrent calls for the same path share one upstream request, each
+        # caller decodes its own copy as the parsers modify what they're given
+        try:
+            if self.coalescer is not None:
+                content = self.coalescer.do((api_path, timed), self._fetch,
+                                            api_path, timed, priority,
+                                            endpoint)
+            else:
+                content = self._fetch(api_path, timed, priority, endpoint)
+        except Exception:
+            stale = self._stale(api_path)
+            if stale is None:
+                if inst is not None:
+                    inst.outcome(endpoint, instrument.REQUEST_ERROR)
+                raise
+            if inst is not None:
+                inst.outcome(endpoint, instrument.CACHE_STALE)
+            return self._decode(stale, endpoint, inst)
+
+        data = self._decode(content, endpoint, inst)
+
+        if cache is not None:
+            cache.set(endpoint, api_path, content)
 
-        signed_url = urlparse.urljoin(API_BASE_URL, signed_path)
+        return data
 
-        req = requests.get(signed_url)
+    def _decode(self, content, endpoint, inst=None):
+        if inst is not None:
+            start = timer()
 
-        data = json.loads(req.content)
+        try:
+            data = json.loads(content)
+        except ValueError:
+            raise APIError("API response isn't valid JSON",
+                           body=content[:1024])
 
+        if inst is not None:
+            inst.phase(endpoint, instrument.DECODE, timer() - start)
         return data
 
     # API methods:
 
+    @instrumented
     def healthcheck(self):
         """Send off a health check to check the status of the system, the
         local clock and the API credentials.
         """
-        return self._api_request("/v2/healthcheck")
+        return self._api_request("/v2/healthcheck", endpoint="healthcheck")
 
+    @instrumented
     def stops_nearby(self, location, mode=None, limit=None,
                      with_distance=False):
         """Return stops near a location.
 
+        If the client has a fresh stop_index the query is answered locally,
+        otherwise it is sent to the API.
+
         Args:
             location: one of (lat, lon), a Location object, or something that
                     has a location property (which would be a Location object)
@@ -113,13 +336,18 @@ class PTVClient(object):
             with_distance is True
         """
 
-        base_path = "/v2/nearme/latitude/{lat}/longitude/{lon}"
+        index = self.stop_index
+        if index is not None and not index.is_stale():
+            out = index.nearest(location, k=limit, mode=mode)
+            if not with_distance:
+                out = [stop for stop, distance in out]
+            return out
 
         lat, lon = parse_location(location)
 
-        path = base_path.format(lat=lat, lon=lon)
+        path = NEARME_PATH.render(lat, lon)
 
-        stops = self._api_request(path)
+        stops = self._api_request(path, endpoint="stops_nearby")
 
         stop_factory = StopFactory(self)
 
@@ -139,6 +367,7 @@ class PTVClient(object):
 
         return out
 
+    @instrumented
     def transport_pois_by_map(self, poi, location1,
                               location2, griddepth, limit=20):
         """Return a list of points of interest within a map grid defined by
@@ -166,51 +395,66 @@ class PTVClient(object):
         lat1, lon1 = parse_location(location1)
         lat2, lon2 = parse_location(location2)
 
-        base_path = "/v2/poi/{poi}/lat1/{lat1}/long1/{lon1}/" + \
-                    "lat2/{lat2}/long2/{lon2}/" + \
-                    "griddepth/{griddepth}/limit/{limit}"
+        poi_ids = [self.MODES[p] for p in poi.split(',')]
 
-        poi_ids = ','.join([str(self.MODES[p]) for p in poi.split(',')])
+        # boxes too big for the tiles are sent as they are
+        tiles = self.poi_tiles
+        if tiles is not None and tiles.covers(lat1, lon1, lat2, lon2):
+            return tiles.query(self, poi_ids, lat1, lon1, lat2, lon2,
+                               griddepth, limit)
 
-        path = base_path.format(poi=poi_ids, lat1=lat1, lon1=lon1,
-                                lat2=lat2, lon2=lon2,
-                                griddepth=griddepth, limit=limit)
+        path = POI_PATH.render(','.join([str(p) for p in poi_ids]),
+                               lat1, lon1, lat2, lon2, griddepth, limit)
 
-        data = self._api_request(path)
-
-        stop_factory = StopFactory(self)
-        outlet_factory = OutletFactory(self)
+        data = self._api_request(path, endpoint="transport_pois_by_map")
 
         out = {}
         for k, v in data.items():
             if k == "locations":
-                out['locations'] = []
-                for location in v:
-                    # either a Stop of an Outlet
-                    if 'transport_type' in location:
-                        item = stop_factory.create(**location)
-                    else:
-                        outlet_type = location.pop('outlet_type')
-                        item = outlet_factory.create(transport_type=outlet_type,
-                                                     **location)
-                    out['locations'].append(item)
+                out['locations'] = self._process_pois(v)
             else:
                 out[k] = v
 
         return out
 
+    def _process_pois(self, locations):
+        """ Stop or Outlet objects for the locations of a poi response """
+
+        stop_factory = StopFactory(self)
+        outlet_factory = OutletFactory(self)
+
+        out = []
+        for location in locations:
+            # either a Stop of an Outlet
+            if 'transport_type' in location:
+                item = stop_factory.create(**location)
+            else:
+                outlet_type = location.pop('outlet_type')
+                item = outlet_factory.create(transport_type=outlet_type,
+                                             **location)
+            out.append(item)
+        return out
+
+    @instrumented
     def search(self, term):
         """All stops and lines that match the search term.
 
+        If the client has a fresh search_index the search is answered
+        locally, otherwise it is sent to the API.
+
         Arguments:
             term: serch term
         Returns:
             list of Stops & Lines
         """
 
+        index = self.search_index
+        if index is not None and not index.is_stale():
+            return index.search(term)
+
         path = "/v2/search/%s" % urllib.quote(term)
 
-        data = self._api_request(path)
+        data = self._api_request(path, endpoint="search")
 
         stop_factory = StopFactory(self)
         line_factory = LineFactory(self)
@@ -226,18 +470,30 @@ class PTVClient(object):
 
         return out
 
-    def lines_by_mode(self, mode, name=None):
-        """ all the lines for a particular transport mode """
-        base_path = "/v2/lines/mode/{mode}"
+    @instrumented
+    def lines_by_mode(self, mode, name=None, fresh=False):
+        """All the lines for a particular transport mode
+
+        Arguments:
+            mode: transport mode
+            name: (optional) only lines with this in their name
+            fresh: (optional) skip the snapshot and ask the API
+        Returns:
+            List of lines.
+        """
+
+        snapshot = self.snapshot
+        if not fresh and snapshot is not None and snapshot.has_mode(mode):
+            return snapshot.lines_by_mode(self, mode, name)
 
         mode_id = self.MODES[mode]
 
-        path = base_path.format(mode=mode_id)
+        path = LINES_PATH.render(mode_id)
 
         if name is not None:
             path += "?name=%s" % name
 
-        data = self._api_request(path)
+        data = self._api_request(path, endpoint="lines_by_mode")
 
         line_factory = LineFactory(self)
 
@@ -247,22 +503,27 @@ class PTVClient(object):
 
         return out
 
-    def stops_on_a_line(self, mode, line):
+    @instrumented
+    def stops_on_a_line(self, mode, line, fresh=False):
         """All stops for a particular transport mode on a given line
         Arguments:
             mode: transport mode
             line: the line_id of a particular line
+            fresh: (optional) skip the snapshot and ask the API
         Returns:
             List of stops.
         """
 
-        base_path = "/v2/mode/{mode}/line/{line}/stops-for-line"
+        if not fresh and self.snapshot is not None:
+            stops = self.snapshot.stops_on_a_line(self, mode, line)
+            if stops is not None:
+                return stops
 
         mode_id = self.MODES[mode]
 
-        path = base_path.format(mode=mode_id, line=line)
+        path = LINE_STOPS_PATH.render(mode_id, line)
 
-        data = self._api_request(path)
+        data = self._api_request(path, endpoint="stops_on_a_line")
 
         stop_factory = StopFactory(self)
 
@@ -272,56 +533,95 @@ class PTVClient(object):
 
         return out
 
-    def _process_departures(self, departures):
-        """ common reponse parser for handling a list of departures """
+    def network(self, modes=None, fresh=False):
+        """Walk the whole transport network, one line at a time.
+
+        Arguments:
+            modes: (optional) transport modes to walk, defaults to all of them
+            fresh: (optional) skip the snapshot and ask the API
+        Returns:
+            A generator of (Line, list of Stops) tuples
+        """
+
+        if modes is None:
+            modes = sorted(LineFactory.classes)
+
+        for mode in modes:
+            for line in self.lines_by_mode(mode, fresh=fresh):
+                stops = self.stops_on_a_line(mode, line.line_id, fresh=fresh)
+                yield line, stops
+
+    def build_stop_index(self, modes=None, **kwargs):
+        """Index every stop on the network so that stops_nearby can be
+        answered without calling the API. Arguments are passed on to
+        StopIndex.
+        """
+
+        self.stop_index = StopIndex.build(self, modes=modes, **kwargs)
+        return self.stop_index
+
+    def build_search_index(self, modes=None, **kwargs):
+        """Index the names of every line and stop on the network so that
+        search can be answered without calling the API. Arguments are passed
+        on to SearchIndex.
+        """
+
+        self.search_index = SearchIndex.build(self, modes=modes, **kwargs)
+        return self.search_index
+
+    def load_snapshot(self, path):
+        """Serve lines_by_mode and stops_on_a_line from a snapshot file
+        saved by save_snapshot.
+        """
+
+        self.snapshot = NetworkSnapshot(path)
+        return self.snapshot
+
+    def save_snapshot(self, path, modes=None):
+        """Fetch the whole network from the API, save it to an SQLite file
+        and serve lines_by_mode and stops_on_a_line from it from now on.
+        """
+
+        snapshot = NetworkSnapshot(path)
+        snapshot.save(self, modes=modes)
+        self.snapshot = snapshot
+        return snapshot
+
+    def _process_departures(self, departures, columnar=False):
+        """common reponse parser for handling a list of departures
+
+        With columnar, departures are returned as a numpy structured array
+        (see pyptv.columnar.departure_columns) without building any objects.
+        If the client has lazy_departures set they're returned as Departures,
+        which only build their objects when they are looked at.
+        """
+
+        if columnar:
+            return departure_columns(departures)
+
+        if self.lazy_departures:
+            return [Departure(self, departure) for departure in departures]
 
-        line_factory = LineFactory(self)
-        stop_factory = StopFactory(self)
         run_factory = RunFactory(self)
 
         out = []
         for departure in departures:
-            # - platform
-            # -- direction
-            # --- line
-            platform_details = departure['platform']
-            direction_details = platform_details.pop('direction')
-            line_details = direction_details.pop('line')
-            line = line_factory.create(**line_details)
-            direction_details['line'] = line
-            direction = Direction(**direction_details)
-            platform_details['direction'] = direction
-            # --- stop
-            stop_details = platform_details.pop('stop')
-            stop = stop_factory.create(**stop_details)
-            platform_details['stop'] = stop
-            platform = Platform(**platform_details)
-            # - run
-            run_details = departure['run']
-            run = run_factory.create(**run_details)
-
-            timetable = parse_datetime_tz(departure["time_timetable_utc"])
-            if departure["time_realtime_utc"] is not None:
-                realtime = parse_datetime_tz(departure["time_realtime_utc"])
-            else:
-                realtime = None
+            platform = build_platform(self, departure['platform'])
+            run = run_factory.create(**departure['run'])
 
-            if departure['flags']:
-                flags = ', '.join([self.FLAGS[f] for f
-                                   in departure['flags'].split('-')
-                                   if f != 'E'])
-            else:
-                flags = None
+            timetable = build_time(departure["time_timetable_utc"])
+            realtime = build_time(departure["time_realtime_utc"])
 
             out.append({"platform": platform,
                         "run": run,
-                        "flags": flags,
+                        "flags": build_flags(self, departure['flags']),
                         "time_timetable_utc": timetable,
                         "time_realtime_utc": realtime,
                         })
         return out
 
-    def broad_next_departures(self, mode, stop, limit=5):
+    @instrumented
+    def broad_next_departures(self, mode, stop, limit=5, columnar=False):
         """Departure times at a particular stop, irrespective of line or
         direction.
 
@@ -329,20 +629,109 @@ class PTVClient(object):
             mode: transport mode
             stop: stop_id of a stop
             limit: max results to return
+            columnar: (optional) return a numpy structured array
         Returns:
             A list of departures
         """
 
-        base_path = "/v2/mode/{mode}/stop/{stop}/" + \
-                    "departures/by-destination/limit/{limit}"
         mode_id = self.MODES[mode]
-        path = base_path.format(mode=mode_id, stop=stop, limit=limit)
-        departures = self._api_request(path)
+        path = BROAD_DEPARTURES_PATH.render(mode_id, stop, limit)
+        departures = self._api_request(path, endpoint="broad_next_departures")
 
-        return self._process_departures(departures["values"])
+        return self._process_departures(departures["values"], columnar)
 
+    def _fan_out(self, fetch, jobs, workers):
+        """Run fetch(arg) for each (key, arg) job on a pool of workers and
+        yield (key, result, error) tuples as each one finishes.
+
+        The workers send their requests at the calling thread's
+        request_priority.
+        """
+
+        # taken now, as the generator below only starts once it's iterated
+        priority = self.current_priority()
+
+        def run(job):
+            key, arg = job
+            try:
+                return key, self._with_priority(priority, fetch, arg), None
+            except Exception as e:
+                return key, None, e
+
+        workers = max(workers, 1)
+
+        def results():
+            pool = self._fan_out_workers(workers)
+            done = Queue.Queue()
+            pending = iter(jobs)
+
+            # only workers jobs are handed to the pool at a time, so one left
+            # unfinished if the generator is abandoned is all that's wasted
+            running = 0
+            for job in itertools.islice(pending, workers):
+                pool.apply_async(run, (job,), callback=done.put)
+                running += 1
+
+            while running:
+                result = done.get()
+                running -= 1
+                for job in itertools.islice(pending, 1):
+                    pool.apply_async(run, (job,), callback=done.put)
+                    running += 1
+                yield result
+
+        return results()
+
+    def _fan_out_workers(self, workers):
+        """ the client's pool for _fan_out, with at least workers threads """
+
+        with self._fan_out_lock:
+            pool = self._fan_out_pool
+            if pool is None or self._fan_out_size < workers:
+                if pool is not None:
+                    # its threads exit once they finish the jobs they have
+                    pool.close()
+                pool = self._fan_out_pool = ThreadPool(workers)
+                self._fan_out_size = workers
+            return pool
+
+    def close(self):
+        """ shut down the workers used to send requests concurrently """
+
+        with self._fan_out_lock:
+            pool = self._fan_out_pool
+            self._fan_out_pool = None
+            self._fan_out_size = 0
+        if pool is not None:
+            pool.close()
+            pool.join()
+
+    def broad_next_departures_many(self, stops, limit=5, workers=8):
+        """Departure times at many stops, fetched concurrently.
+
+        Arguments:
+            stops: Stop objects
+            limit: max results to return per stop
+            workers: number of requests to send at once
+        Returns:
+            A generator of (stop_id, departures, error) tuples, yielded as
+            each stop's request finishes. error is None on success, otherwise
+            departures is None and error is the exception raised for that
+            stop.
+        """
+
+        def fetch(stop):
+            return self.broad_next_departures(mode=stop.transport_type,
+                                              stop=stop.stop_id, limit=limit)
+
+        jobs = [(stop.stop_id, stop) for stop in stops]
+
+        return self._fan_out(fetch, jobs, workers)
+
+    @instrumented
     def specific_next_departures(self, mode, line, stop,
-                                 direction, limit=5, for_utc=None):
+                                 direction, limit=5, for_utc=None,
+                                 columnar=False):
         """Departure times at a particular stop for a given line and direction
 
         Arguments:
@@ -352,43 +741,76 @@ class PTVClient(object):
             direction: direction_id of run's direction
             limit: max results to return
             for_utc: (optional) date and time of the request
+            columnar: (optional) return a numpy structured array
         Returns:
             A list of departures
         """
 
-        base_path = "/v2/mode/{mode}/line/{line}/stop/{stop}/" + \
-                    "directionid/{direction}/departures/all/limit/{limit}"
-
         mode_id = self.MODES[mode]
 
-        path = base_path.format(mode=mode_id, line=line, stop=stop,
-                                direction=direction, limit=limit)
+        path = SPECIFIC_DEPARTURES_PATH.render(mode_id, line, stop, direction,
+                                               limit)
 
         if for_utc is not None:
             path += "?for_utc=%s" % for_utc
 
-        departures = self._api_request(path)
+        departures = self._api_request(path,
+                                       endpoint="specific_next_departures")
+
+        return self._process_departures(departures["values"], columnar)
 
-        return self._process_departures(departures["values"])
+    def specific_next_departures_many(self, platforms, limit=5,
+                                      for_utc=None, workers=8):
+        """Departure times for many platforms (a line and direction at a
+        stop), fetched concurrently.
 
+        Arguments:
+            platforms: Platform objects
+            limit: max results to return per platform
+            for_utc: (optional) date and time of the request
+            workers: number of requests to send at once
+        Returns:
+            A generator of ((stop_id, line_id, direction_id), departures,
+            error) tuples, yielded as each platform's request finishes. error
+            is None on success, otherwise departures is None and error is the
+            exception raised for that platform.
+        """
+
+        def fetch(platform):
+            direction = platform.direction
+            return self.specific_next_departures(
+                mode=platform.stop.transport_type,
+                line=direction.line.line_id, stop=platform.stop.stop_id,
+                direction=direction.direction_id, limit=limit,
+                for_utc=for_utc)
+
+        jobs = [((platform.stop.stop_id, platform.direction.line.line_id,
+                  platform.direction.direction_id), platform)
+                for platform in platforms]
+
+        return self._fan_out(fetch, jobs, workers)
+
+    @instrumented
     def specific_next_departures_gtfs(self, mode, route_id, stop, direction,
-                                      for_utc=None):
+                                      limit=5, for_utc=None, columnar=False):
         """ TODO: explain how this differs from previous method """
 
-        base_path = "/v2/mode/{mode}/route_id/{route_id}/stop/{stop}/" + \
-                    "direction/{direction}/departures/all/limit/{limit}"
+        mode_id = self.MODES[mode]
 
-        path = base_path.format(mode=mode, route_id=route_id, stop=stop,
-                                direction=direction)
+        path = GTFS_DEPARTURES_PATH.render(mode_id, route_id, stop, direction,
+                                           limit)
 
         if for_utc is not None:
             path += "?for_utc=%s" % for_utc
 
-        departures = self._api_request(path)
+        departures = self._api_request(path,
+                                       endpoint="specific_next_departures_gtfs")
 
-        return self._process_departures(departures["values"])
+        return self._process_departures(departures["values"], columnar)
 
-    def stopping_pattern(self, mode, run, stop, for_utc=None):
+    @instrumented
+    def stopping_pattern(self, mode, run, stop, for_utc=None,
+                         columnar=False):
         """Stopping pattern for a particular run from a given stop
 
         Arguments:
@@ -396,21 +818,22 @@ class PTVClient(object):
             run: transport run_id
             stop: stop_id of a stop
             for_utc: (optional) date and time of the request
+            columnar: (optional) return a numpy structured array
         Returns:
             A list of departures
         """
 
-        base_path = "/v2/mode/{mode}/run/{run}/stop/{stop}/stopping-pattern"
         mode_id = self.MODES[mode]
-        path = base_path.format(mode=mode_id, run=run, stop=stop)
+        path = STOPPING_PATTERN_PATH.render(mode_id, run, stop)
 
         if for_utc is not None:
             path += "?for_utc=%s" % for_utc
 
-        data = self._api_request(path)
+        data = self._api_request(path, endpoint="stopping_pattern")
 
-        return self._process_departures(data['values'])
+        return self._process_departures(data['values'], columnar)
 
+    @instrumented
     def disruptions(self, modes="general"):
         """Planned and unplanned disruptions on the transport network.
 
@@ -426,9 +849,9 @@ class PTVClient(object):
                        regional-train
         """
 
-        path = "/v2/disruptions/modes/%s" % modes
+        path = DISRUPTIONS_PATH.render(modes)
 
-        data = self._api_request(path)
+        data = self._api_request(path, endpoint="disruptions")
 
         factory = DisruptionFactory(self)
 
@@ -0,0 +1,111 @@
+try:
+    import numpy as np
+except ImportError:  # numpy is optional, only needed for columnar results
+    np = None
+
+from pyptv.utils import parse_epoch
+
+
+# stands in for a missing realtime departure time
+NO_TIME = -1
+
+# bit in the flags column for each departure flag, see PTVClient.FLAGS
+FLAG_BITS = {"RR": 1 << 0,
+             "GC": 1 << 1,
+             "DOO": 1 << 2,
+             "PUO": 1 << 3,
+             "MO": 1 << 4,
+             "TU": 1 << 5,
+             "WE": 1 << 6,
+             "TH": 1 << 7,
+             "FR": 1 << 8,
+             "SS": 1 << 9,
+             "E": 1 << 10,
+             }
+
+DEPARTURE_FIELDS = [("stop_id", "i8"),
+                    ("line_id", "i8"),
+                    ("direction_id", "i8"),
+                    ("run_id", "i8"),
+                    ("time_timetable_utc", "i8"),
+                    ("time_realtime_utc", "i8"),
+                    ("flags", "u4"),
+                    ]
+
+
+def flags_mask(raw):
+    """ bitmask of a raw flags string, e.g. 'RR-E' """
+    mask = 0
+    if raw:
+        for flag in raw.split('-'):
+            mask |= FLAG_BITS.get(flag, 0)
+    return mask
+
+
+def departure_columns(departures):
+    """Convert raw departures from the API into a numpy structured array with
+    one row per departure and the columns in DEPARTURE_FIELDS. Times are
+    seconds since the epoch (UTC), with NO_TIME for a missing realtime.
+
+    Arrays from many calls can be joined with numpy.concatenate.
+    """
+
+    if np is None:
+        raise ImportError("columnar results require numpy")
+
+    table = np.empty(len(departures), dtype=DEPARTURE_FIELDS)
+
+    for i, departure in enumerate(departures):
+        platform = departure['platform']
+        direction = platform['direction']
+        realtime = departure['time_realtime_utc']
+
+        table[i] = (platform['stop']['stop_id'],
+                    direction['line']['line_id'],
+                    direction['direction_id'],
+                    departure['run']['run_id'],
+                    parse_epoch(departure['time_timetable_utc']),
+                    parse_epoch(realtime) if realtime is not None
+                    else NO_TIME,
+                    flags_mask(departure['flags']))
+
+    return table
+
+
+def delay_seconds(table):
+    """Realtime minus timetabled departure time for each row, NaN where
+    there is no realtime information.
+    """
+
+    realtime = table['time_realtime_utc']
+    delay = (realtime - table['time_timetable_utc']).astype(np.float64)
+    delay[realtime == NO_TIME] = np.nan
+    return delay
+
+
+def headway_seconds(table):
+    """Seconds between consecutive departures of each (stop, line,
+    direction), in the order of the table sorted by those and timetabled time.
+
+    Returns:
+        a tuple of (sorted table, headways) where headways[i] is the gap
+        before row i of the sorted table, NaN for the first departure of
+        each group
+    """
+
+    order = np.lexsort((table['time_timetable_utc'], table['direction_id'],
+                        table['line_id'], table['stop_id']))
+    ordered = table[order]
+
+    times = ordered['time_timetable_utc'].astype(np.float64)
+    headways = np.empty(len(ordered))
+    headways[1:] = np.diff(times)
+    if len(ordered):
+        headways[0] = np.nan
+
+    same_group = (ordered['stop_id'][1:] == ordered['stop_id'][:-1]) & \
+                 (ordered['line_id'][1:] == ordered['line_id'][:-1]) & \
+                 (ordered['direction_id'][1:] == ordered['direction_id'][:-1])
+    headways[1:][~same_group] = np.nan
+
+    return ordered, headways
@@ -0,0 +1,115 @@
+from collections import Mapping
+
+from pyptv.platform_ import Platform  # don't clobber the builtin platform
+from pyptv.direction import Direction
+from pyptv.stop import StopFactory
+from pyptv.line import LineFactory
+from pyptv.run import RunFactory
+from pyptv.utils import parse_datetime_tz
+
+
+def build_platform(client, details):
+    """ Platform, with its Direction, Line & Stop, from a raw departure """
+
+    # - platform
+    # -- direction
+    # --- line
+    platform_details = dict(details)
+    direction_details = dict(platform_details.pop('direction'))
+    line_details = direction_details.pop('line')
+    line = LineFactory(client).create(**line_details)
+    direction_details['line'] = line
+    direction = Direction(**direction_details)
+    platform_details['direction'] = direction
+    # --- stop
+    stop_details = platform_details.pop('stop')
+    stop = StopFactory(client).create(**stop_details)
+    platform_details['stop'] = stop
+    return Platform(**platform_details)
+
+
+def build_flags(client, raw):
+    """ readable description of a raw flags string, e.g. 'RR-E' """
+
+    if not raw:
+        return None
+    return ', '.join([client.FLAGS[f] for f in raw.split('-') if f != 'E'])
+
+
+def build_time(raw):
+    if raw is None:
+        return None
+    return parse_datetime_tz(raw)
+
+
+class Departure(Mapping):
+    """A departure that keeps the raw row from the API, and only builds the
+    objects and datetimes in it when they're first looked at.
+
+    It can be used just like the dictionaries PTVClient returns, e.g.
+    departure['run'].run_id, and the same values are also attributes,
+    e.g. departure.run.run_id
+    """
+
+    KEYS = ("platform", "run", "flags",
+            "time_timetable_utc", "time_realtime_utc")
+
+    def __init__(self, client, raw):
+        self._client = client
+        self._raw = raw
+        self._values = {}
+
+    def __getitem__(self, key):
+        try:
+            return self._values[key]
+        except KeyError:
+            pass
+
+        raw = self._raw
+        if key == "platform":
+            value = build_platform(self._client, raw['platform'])
+        elif key == "run":
+            value = RunFactory(self._client).create(**raw['run'])
+        elif key == "flags":
+            value = build_flags(self._client, raw['flags'])
+        elif key in ("time_timetable_utc", "time_realtime_utc"):
+            value = build_time(raw[key])
+        else:
+            raise KeyError(key)
+
+        self._values[key] = value
+        return value
+
+    def __iter__(self):
+        return iter(self.KEYS)
+
+    def __len__(self):
+        return len(self.KEYS)
+
+    def __repr__(self):
+        return "<Departure: %s>" % dict(self)
+
+    @property
+    def raw(self):
+        """ the departure as it came from the API """
+        return self._raw
+
+    @property
+    def platform(self):
+        return self["platform"]
+
+    @property
+    def run(self):
+        return self["run"]
+
+    @property
+    def flags(self):
+        return self["flags"]
+
+    @property
+    def time_timetable_utc(self):
+        return self["time_timetable_utc"]
+
+    @property
+    def time_realtime_utc(self):
+        return self["time_realtime_utc"]
@@ -1,6 +1,8 @@
 
 class Direction(object):
 
+    __slots__ = ('direction_id', 'direction_name', 'line', 'linedir_id')
+
     def __init__(self, direction_id, direction_name, line, linedir_id):
 
         self.direction_id = direction_id
@@ -3,6 +3,18 @@ from pyptv.factory import TypeFactory
 from pyptv.utils import parse_datetime_tz
 
 
+# the transport modes that each disruption mode is about, None for all of
+# them. Regional buses are mode bus, and night rider buses are metro buses
+DISRUPTION_MODES = {"general": None,
+                    "metro-bus": ("bus", "nightrider"),
+                    "metro-train": ("train",),
+                    "metro-tram": ("tram",),
+                    "regional-bus": ("bus",),
+                    "regional-coach": ("vline",),
+                    "regional-train": ("vline",),
+                    }
+
+
 class Disruption(object):
 
     def __repr__(self):
@@ -0,0 +1,296 @@
+from collections import namedtuple
+from hashlib import sha1
+import re
+import time
+
+from pyptv.client import DISRUPTIONS_PATH
+from pyptv.disruption import DisruptionFactory, DISRUPTION_MODES
+
+
+ADDED = "added"
+CHANGED = "changed"
+REMOVED = "removed"
+
+ALL_MODES = ",".join(sorted(DISRUPTION_MODES))
+
+HASHED_FIELDS = ("title", "description", "url", "publishedOn")
+
+# stop names shorter than this are too likely to match by accident
+MIN_STOP_NAME = 5
+
+
+class DisruptionEvent(namedtuple("DisruptionEvent",
+                                 ["kind", "key", "disruption", "previous"])):
+    """A change to the disruptions between two polls.
+
+    kind: one of ADDED, CHANGED or REMOVED
+    key: (disruption mode, url or title) identifying the disruption
+    disruption: the Disruption as it is now (None when REMOVED)
+    previous: the Disruption as it was last poll (None when ADDED)
+    """
+    __slots__ = ()
+
+
+def content_hash(item):
+    """ hash of a raw disruption's title, description, url & publishedOn """
+    digest = sha1()
+    for field in HASHED_FIELDS:
+        value = item.get(field) or u""
+        digest.update(value.encode("utf-8"))
+        digest.update("\x1f")
+    return digest.hexdigest()
+
+
+def line_key(line):
+    return (line.transport_type, line.line_id)
+
+
+def stop_key(stop):
+    return (stop.transport_type, stop.stop_id)
+
+
+def _line_pattern(line):
+    """ regex for a line being mentioned, by name or e.g. 'Route 19' """
+    alternatives = []
+    if line.line_name:
+        alternatives.append(re.escape(line.line_name.lower()))
+    if line.line_number:
+        alternatives.append(r"\b(?:route|line|bus|tram)s?\s+%s\b" %
+                            re.escape(str(line.line_number).lower()))
+    if not alternatives:
+        return None
+    return re.compile("|".join(alternatives))
+
+
+def _about(mode, transport_type):
+    """ whether a disruption mode can be about a transport mode """
+    transport_types = DISRUPTION_MODES.get(mode)
+    return transport_types is None or transport_type in transport_types
+
+
+def _stop_name(stop):
+    """ a stop's name without its stop number, e.g. 'Glenlyon Rd/Sydney Rd' """
+    name = (stop.location_name or "").split("#")[0].strip().lower()
+    if len(name) < MIN_STOP_NAME:
+        return None
+    return name
+
+
+class DisruptionTracker(object):
+    """Polls disruptions and reports only what was added, changed or removed,
+    keeping an index of which watched lines and stops they affect.
+
+    Disruptions are told apart by their mode and url (or title, without
+    one), and compared between polls by a hash of their title, description,
+    url and publishedOn, so unchanged ones aren't rebuilt.
+
+    The API's disruptions don't say which lines or stops they're about, so
+    they're matched to the lines and stops being watched (see watch) of the
+    same transport mode by the text of their title & description:
+    a line's name or e.g. 'Route 19', and a stop's name. A disruption
+    affecting a line also affects the stops watched along with it.
+
+    Arguments:
+        client: PTVClient to fetch disruptions with
+        modes: disruption modes to poll, comma separated, defaults to all
+        interval: seconds between polls when iterating
+        sleep: function used to wait between polls
+    """
+
+    def __init__(self, client, modes=ALL_MODES, interval=60,
+                 sleep=time.sleep):
+        self.client = client
+        self.modes = modes
+        self.interval = interval
+        self.sleep = sleep
+        self.polls = 0
+
+        # disruption key -> (content hash, Disruption, text)
+        self._current = {}
+        # line key -> (Line, pattern, [stop keys])
+        self._lines = {}
+        # stop key -> (Stop, name)
+        self._stops = {}
+        # line / stop key -> set of disruption keys
+        self._by_line = {}
+        self._by_stop = {}
+        # disruption key -> (line keys, stop keys) it's indexed under
+        self._matches = {}
+
+    def __len__(self):
+        return len(self._current)
+
+    @property
+    def disruptions(self):
+        """ every current Disruption """
+        return [current[1] for current in self._current.values()]
+
+    # what to match disruptions against
+
+    def watch(self, line, stops=()):
+        """Index disruptions against a Line, and the Stops on it."""
+
+        key = line_key(line)
+        rewatched = self._by_line.get(key, set())
+
+        stop_keys = []
+        new_stops = []
+        for stop in stops:
+            skey = stop_key(stop)
+            stop_keys.append(skey)
+            if skey not in self._stops:
+                self._stops[skey] = (stop, _stop_name(stop))
+                new_stops.append(skey)
+        pattern = _line_pattern(line)
+        self._lines[key] = (line, pattern, stop_keys)
+
+        # what a line was watched with before may no longer apply, so the
+        # disruptions it matched are indexed again from scratch
+        for dkey in list(rewatched):
+            self._unindex(dkey)
+            self._index(dkey)
+
+        # otherwise only the new line & stops need matching against what's
+        # already known
+        for dkey, (_, _, text) in self._current.items():
+            mode = dkey[0]
+            lines = set()
+            matched = set()
+            if _about(mode, key[0]) and pattern is not None and \
+                    pattern.search(text):
+                lines.add(key)
+                matched.update(stop_keys)
+            for skey in new_stops:
+                name = self._stops[skey][1]
+                if _about(mode, skey[0]) and name is not None and \
+                        name in text:
+                    matched.add(skey)
+            if lines or matched:
+                self._add_matches(dkey, lines, matched)
+
+    def watch_network(self, network):
+        """ watch every (Line, Stops) from e.g. PTVClient.network() """
+        for line, stops in network:
+            self.watch(line, stops)
+
+    def _affected(self, mode, text):
+        """ (line keys, stop keys) that a disruption's text mentions """
+
+        lines = set()
+        stops = set()
+        for key, (line, pattern, stop_keys) in self._lines.items():
+            if not _about(mode, key[0]):
+                continue
+            if pattern is not None and pattern.search(text):
+                lines.add(key)
+                stops.update(stop_keys)
+
+        for key, (stop, name) in self._stops.items():
+            if not _about(mode, key[0]):
+                continue
+            if name is not None and name in text:
+                stops.add(key)
+
+        return lines, stops
+
+    def _index(self, dkey):
+        text = self._current[dkey][2]
+        lines, stops = self._affected(dkey[0], text)
+        self._add_matches(dkey, lines, stops)
+
+    def _add_matches(self, dkey, lines, stops):
+        matches = self._matches.setdefault(dkey, (set(), set()))
+        for key in lines:
+            self._by_line.setdefault(key, set()).add(dkey)
+            matches[0].add(key)
+        for key in stops:
+            self._by_stop.setdefault(key, set()).add(dkey)
+            matches[1].add(key)
+
+    def _unindex(self, dkey):
+        lines, stops = self._matches.pop(dkey, ((), ()))
+        for key in lines:
+            self._by_line[key].discard(dkey)
+            if not self._by_line[key]:
+                del self._by_line[key]
+        for key in stops:
+            self._by_stop[key].discard(dkey)
+            if not self._by_stop[key]:
+                del self._by_stop[key]
+
+    # lookups
+
+    def _lookup(self, index, key):
+        out = [self._current[dkey][1] for dkey in index.get(key, ())]
+        out.sort(key=lambda disruption: disruption.publishedOn, reverse=True)
+        return out
+
+    def for_line(self, line):
+        """ current Disruptions affecting a Line, newest first """
+        return self._lookup(self._by_line, line_key(line))
+
+    def for_stop(self, stop):
+        """ current Disruptions affecting a Stop, newest first """
+        return self._lookup(self._by_stop, stop_key(stop))
+
+    # polling
+
+    def diff(self, data):
+        """Compare a raw disruptions response from the API against the last
+        one, update the index, and return a list of DisruptionEvents.
+        """
+
+        factory = DisruptionFactory(self.client)
+
+        seen = set()
+        events = []
+        for mode, items in sorted(data.items()):
+            for item in items:
+                dkey = (mode, item.get("url") or item.get("title"))
+                # two different disruptions with the same url are numbered
+                n = 1
+                while dkey in seen:
+                    n += 1
+                    dkey = (mode, item.get("url") or item.get("title"), n)
+                seen.add(dkey)
+
+                digest = content_hash(item)
+                previous = self._current.get(dkey)
+                if previous is not None and previous[0] == digest:
+                    continue
+
+                disruption = factory.create(transport_type=mode, **item)
+                text = u" ".join([item.get("title") or u"",
+                                  item.get("description") or u""]).lower()
+                if previous is not None:
+                    self._unindex(dkey)
+                self._current[dkey] = (digest, disruption, text)
+                self._index(dkey)
+
+                if previous is None:
+                    events.append(DisruptionEvent(ADDED, dkey, disruption,
+                                                  None))
+                else:
+                    events.append(DisruptionEvent(CHANGED, dkey, disruption,
+                                                  previous[1]))
+
+        removed = [key for key in self._current if key not in seen]
+        for dkey in removed:
+            previous = self._current.pop(dkey)
+            self._unindex(dkey)
+            events.append(DisruptionEvent(REMOVED, dkey, None, previous[1]))
+
+        return events
+
+    def poll(self):
+        """ fetch disruptions once and return what changed """
+        self.polls += 1
+        data = self.client._api_request(DISRUPTIONS_PATH.render(self.modes),
+                                        endpoint="disruptions")
+        return self.diff(data)
+
+    def __iter__(self):
+        while True:
+            for event in self.poll():
+                yield event
+            self.sleep(self.interval)
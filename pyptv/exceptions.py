@@ -0,0 +1,36 @@
+class PTVError(Exception):
+    """ base class for errors talking to the API """
+
+
+class APIError(PTVError):
+    """The API answered with an error, or with something that isn't JSON
+    (e.g. an HTML error page from a proxy).
+
+    Attributes:
+        status: HTTP status code, or None if the response looked successful
+            but wasn't JSON
+        body: (the start of) the response body
+    """
+
+    def __init__(self, message, status=None, body=None):
+        super(APIError, self).__init__(message)
+        self.status = status
+        self.body = body
+
+    @property
+    def retryable(self):
+        """ whether trying again might work, i.e. it's not our fault """
+        return self.status is None or self.status >= 500 or \
+            self.status == 429
+
+
+class CircuitOpenError(PTVError):
+    """Requests to an end point family aren't being sent because it has been
+    failing, see resilience.CircuitBreaker.
+    """
+
+    def __init__(self, family, retry_in):
+        super(CircuitOpenError, self).__init__(
+            "circuit for %s is open, retrying in %.1fs" % (family, retry_in))
+        self.family = family
+        self.retry_in = retry_in
@@ -1,11 +1,21 @@
 
 class TypeFactory(object):
 
+    # keyword argument identifying an object, for types whose objects are
+    # shared through the client's identity map
+    identity = None
+
     def __init__(self, client):
         self.client = client
 
     def create(self, transport_type, *args, **kwargs):
         klass = self.classes[transport_type]
+
+        identity_map = getattr(self.client, 'identity_map', None)
+        if identity_map is not None and self.identity in kwargs:
+            key = (self.identity, transport_type, kwargs[self.identity])
+            return identity_map.resolve(key, klass, self.client, args, kwargs)
+
         cls = klass(*args, **kwargs)
         cls._client = self.client
         return cls
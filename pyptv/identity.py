@@ -0,0 +1,49 @@
+import threading
+import weakref
+
+
+class IdentityMap(object):
+    """Registry of canonical objects, so that every response mentioning the
+    same line or stop gets the same object back.
+
+    Objects are held weakly, once nothing else refers to one it drops out of
+    the map. When an object is seen again it is updated in place with the
+    latest details from the API.
+    """
+
+    def __init__(self):
+        self._objects = weakref.WeakValueDictionary()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self._objects)
+
+    def get(self, key):
+        return self._objects.get(key)
+
+    def resolve(self, key, klass, client, args, kwargs):
+        """Return the canonical object for key, updated with args & kwargs,
+        creating it with klass if there isn't one.
+        """
+
+        with self._lock:
+            obj = self._objects.get(key)
+            if obj is not None and type(obj) is klass:
+                self.hits += 1
+                obj.__init__(*args, **kwargs)
+                return obj
+
+            self.misses += 1
+            obj = klass(*args, **kwargs)
+            obj._client = client
+            self._objects[key] = obj
+            return obj
+
+    def stats(self):
+        with self._lock:
+            return {"objects": len(self._objects),
+                    "hits": self.hits,
+                    "misses": self.misses,
+                    }
@@ -0,0 +1,248 @@
+from bisect import bisect_left
+from collections import namedtuple
+from functools import wraps
+import threading
+import time
+
+
+timer = time.time
+
+# phases of an API call
+SIGN = "sign"
+TRANSFER = "transfer"
+DECODE = "decode"
+MATERIALIZE = "materialize"
+
+PHASES = (SIGN, TRANSFER, DECODE, MATERIALIZE)
+
+# outcomes of an API call, or of one attempt at sending it
+CACHE_HIT = "cache_hit"
+CACHE_MISS = "cache_miss"
+CACHE_STALE = "cache_stale"
+ATTEMPT_ERROR = "attempt_error"
+REQUEST_ERROR = "request_error"
+
+OUTCOMES = (CACHE_HIT, CACHE_MISS, CACHE_STALE, ATTEMPT_ERROR, REQUEST_ERROR)
+
+SECONDS_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1,
+                   0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+BYTES_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+
+
+class Event(namedtuple("Event", ["name", "endpoint", "value", "time"])):
+    """Something measured while making an API call, passed to callbacks.
+
+    name is one of the PHASES with value in seconds, "response_bytes" with
+    the size of a response from the API, or one of the OUTCOMES with a
+    value of 1. time is when it was recorded.
+    """
+    __slots__ = ()
+
+
+class Histogram(object):
+    """ counts of observed values falling into each of some buckets """
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        # the last one is for values over the biggest bucket
+        self.counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.sum = 0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def cumulative(self):
+        """ [(upper bound, observations <= it)], ending with +Inf """
+        out = []
+        total = 0
+        for bound, count in zip(self.buckets + (float('inf'),), self.counts):
+            total += count
+            out.append((bound, total))
+        return out
+
+
+def instrumented(method):
+    """Time how long an API method spends turning the response into
+    objects, when its client has instrumentation.
+    """
+
+    endpoint = method.__name__
+
+    @wraps(method)
+    def wrapper(self, *args, **kwargs):
+        instrumentation = self.instrumentation
+        if instrumentation is None:
+            return method(self, *args, **kwargs)
+        return instrumentation.call(endpoint, method, self, args, kwargs)
+
+    return wrapper
+
+
+class Instrumentation(object):
+    """Timings and outcomes of API calls made by a PTVClient, for each end
+    point.
+
+    Each call is split into the phases:
+        sign: building the signed url
+        transfer: sending the request and reading the response (including
+            waiting for a pooled connection)
+        decode: json.loads of the response
+        materialize: everything else the API method does, mostly building
+            Stops, Lines, Departures etc.
+    along with response sizes and cache, retry & error outcomes.
+
+    Pass one to PTVClient(instrumentation=...). Without one the client skips
+    all of this. Results can be read with stats(), exported with
+    prometheus_text(), or passed as Events to callbacks as they happen.
+    """
+
+    def __init__(self, seconds_buckets=SECONDS_BUCKETS,
+                 bytes_buckets=BYTES_BUCKETS):
+        self.seconds_buckets = seconds_buckets
+        self.bytes_buckets = bytes_buckets
+
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._phases = {}
+        self._sizes = {}
+        self._outcomes = {}
+        self._callbacks = []
+
+    def add_callback(self, callback):
+        """ call callback(event) with each Event as it's recorded """
+        self._callbacks.append(callback)
+
+    def remove_callback(self, callback):
+        self._callbacks.remove(callback)
+
+    def _emit(self, name, endpoint, value):
+        if self._callbacks:
+            event = Event(name, endpoint, value, timer())
+            for callback in list(self._callbacks):
+                callback(event)
+
+    def phase(self, endpoint, phase, seconds):
+        with self._lock:
+            histogram = self._phases.get((endpoint, phase))
+            if histogram is None:
+                histogram = self._phases[(endpoint, phase)] = \
+                    Histogram(self.seconds_buckets)
+            histogram.observe(seconds)
+        self._emit(phase, endpoint, seconds)
+
+    def size(self, endpoint, size):
+        with self._lock:
+            histogram = self._sizes.get(endpoint)
+            if histogram is None:
+                histogram = self._sizes[endpoint] = \
+                    Histogram(self.bytes_buckets)
+            histogram.observe(size)
+        self._emit("response_bytes", endpoint, size)
+
+    def outcome(self, endpoint, outcome):
+        key = (endpoint, outcome)
+        with self._lock:
+            self._outcomes[key] = self._outcomes.get(key, 0) + 1
+        self._emit(outcome, endpoint, 1)
+
+    # materialize is what's left of a call after the request
+
+    def call(self, endpoint, method, client, args, kwargs):
+        """ call an API method, recording the time spent outside requests """
+
+        stack = getattr(self._local, 'stack', None)
+        if stack is None:
+            stack = self._local.stack = []
+
+        frame = [0.0]
+        stack.append(frame)
+        start = timer()
+        try:
+            return method(client, *args, **kwargs)
+        finally:
+            elapsed = timer() - start
+            stack.pop()
+            if stack:
+                stack[-1][0] += elapsed
+            self.phase(endpoint, MATERIALIZE, max(elapsed - frame[0], 0.0))
+
+    def requested(self, seconds):
+        """ note time spent on a request, as part of the current call """
+        stack = getattr(self._local, 'stack', None)
+        if stack:
+            stack[-1][0] += seconds
+
+    # reading
+
+    def stats(self):
+        """Totals for each end point, e.g.
+
+            {'broad_next_departures': {'sign': {'count': 3, 'seconds': 0.01},
+                                       'transfer': {...},
+                                       'response_bytes': {'count': 3,
+                                                          'bytes': 61440},
+                                       'cache_hit': 2,
+                                       ...}}
+        """
+
+        out = {}
+        with self._lock:
+            for (endpoint, phase), histogram in self._phases.items():
+                out.setdefault(endpoint, {})[phase] = {
+                    "count": histogram.count, "seconds": histogram.sum}
+            for endpoint, histogram in self._sizes.items():
+                out.setdefault(endpoint, {})["response_bytes"] = {
+                    "count": histogram.count, "bytes": histogram.sum}
+            for (endpoint, outcome), count in self._outcomes.items():
+                out.setdefault(endpoint, {})[outcome] = count
+        return out
+
+    def reset(self):
+        with self._lock:
+            self._phases.clear()
+            self._sizes.clear()
+            self._outcomes.clear()
+
+    def prometheus_text(self, prefix="pyptv"):
+        """ the metrics in Prometheus' text exposition format """
+
+        lines = []
+
+        def histograms(name, help, items):
+            lines.append("# HELP %s %s" % (name, help))
+            lines.append("# TYPE %s histogram" % name)
+            for labels, histogram in items:
+                for bound, count in histogram.cumulative():
+                    le = "+Inf" if bound == float('inf') else repr(bound)
+                    lines.append('%s_bucket{%s,le="%s"} %d' % (
+                        name, labels, le, count))
+                lines.append("%s_sum{%s} %r" % (name, labels, histogram.sum))
+                lines.append("%s_count{%s} %d" % (name, labels,
+                                                  histogram.count))
+
+        with self._lock:
+            phases = sorted(
+                ('endpoint="%s",phase="%s"' % key, histogram)
+                for key, histogram in self._phases.items())
+            sizes = sorted(('endpoint="%s"' % endpoint, histogram)
+                           for endpoint, histogram in self._sizes.items())
+            outcomes = sorted(self._outcomes.items())
+
+        histograms(prefix + "_phase_seconds",
+                   "Seconds spent in each phase of an API call.", phases)
+        histograms(prefix + "_response_bytes",
+                   "Size of responses from the API.", sizes)
+
+        name = prefix + "_outcomes_total"
+        lines.append("# HELP %s Cache, retry and error outcomes of API "
+                     "calls." % name)
+        lines.append("# TYPE %s counter" % name)
+        for (endpoint, outcome), count in outcomes:
+            lines.append('%s{endpoint="%s",outcome="%s"} %d' % (
+                name, endpoint, outcome, count))
+
+        return "\n".join(lines) + "\n"
@@ -0,0 +1,259 @@
+from bisect import bisect_left
+import calendar
+from collections import namedtuple
+
+from pyptv.watcher import departure_time
+
+
+INFINITY = float('inf')
+
+
+class Connection(namedtuple("Connection",
+                            ["departure_stop", "arrival_stop",
+                             "departure_time", "arrival_time",
+                             "departs", "arrives", "run", "line"])):
+    """A run going from one stop to the next without stopping in between.
+    departs and arrives are departure_time and arrival_time in seconds since
+    the epoch.
+    """
+    __slots__ = ()
+
+
+class Leg(namedtuple("Leg", ["run", "line", "board", "alight",
+                             "departure_time", "arrival_time"])):
+    """Part of a journey spent on one run, from boarding at one stop to
+    alighting at another. Walking transfers are legs with no run or line,
+    and no times.
+    """
+    __slots__ = ()
+
+    @property
+    def walking(self):
+        return self.run is None
+
+
+def stop_key(stop):
+    return (stop.transport_type, stop.stop_id)
+
+
+def _epoch(dt):
+    return calendar.timegm(dt.utctimetuple())
+
+
+class TransitGraph(object):
+    """Runs on the network as a timetable of connections between stops, for
+    planning journeys locally rather than by chaining API calls.
+
+    Connections come from stopping patterns (see add_stopping_pattern and
+    sample). Journeys are found with the connection scan algorithm.
+
+    Arguments:
+        min_transfer: seconds needed to change between runs at a stop
+    """
+
+    def __init__(self, min_transfer=120):
+        self.min_transfer = min_transfer
+
+        self.stops = {}
+        self._connections = []
+        self._departs = []
+        self._sorted = True
+        self._runs = set()
+        self._transfers = {}
+
+    def __len__(self):
+        return len(self._connections)
+
+    def _stop(self, stop):
+        key = stop_key(stop)
+        self.stops.setdefault(key, stop)
+        return key
+
+    def add_stopping_pattern(self, departures):
+        """Add the connections of a run, given its stopping pattern (the
+        departures returned by PTVClient.stopping_pattern).
+        """
+
+        # in stopping order, which is by timetabled time. Only the stops
+        # coming up soon have realtime, so a late run's realtime at one stop
+        # can be after the timetabled time at the next
+        ordered = sorted((_epoch(d['time_timetable_utc']), i, d)
+                         for i, d in enumerate(departures))
+
+        # the run can't be anywhere before it's been at the stop before, so
+        # times are pushed back to at least that
+        times = []
+        latest = None
+        for _, _, departure in ordered:
+            when = departure_time(departure)
+            if latest is not None and when < latest:
+                when = latest
+            times.append(when)
+            latest = when
+
+        for i in range(len(ordered) - 1):
+            here = ordered[i][2]
+            there = ordered[i + 1][2]
+            if stop_key(here['platform'].stop) == \
+                    stop_key(there['platform'].stop):
+                continue
+            run = there['run']
+            line = there['platform'].direction.line
+            connection = Connection(
+                departure_stop=self._stop(here['platform'].stop),
+                arrival_stop=self._stop(there['platform'].stop),
+                departure_time=times[i],
+                arrival_time=times[i + 1],
+                departs=_epoch(times[i]), arrives=_epoch(times[i + 1]),
+                run=run, line=line)
+            self._connections.append(connection)
+            self._sorted = False
+
+        for departure in departures:
+            self._runs.add((departure['run'].transport_type,
+                            departure['run'].run_id))
+
+    def add_transfer(self, from_stop, to_stop, seconds, both_ways=True):
+        """Let journeys walk between two stops, taking seconds to do so"""
+
+        a = self._stop(from_stop)
+        b = self._stop(to_stop)
+        self._transfers.setdefault(a, []).append((b, seconds))
+        if both_ways:
+            self._transfers.setdefault(b, []).append((a, seconds))
+
+    def add_walking_transfers(self, stop_index, max_distance=0.3,
+                              walking_speed=5.0):
+        """Add walking transfers between every stop in the graph and the
+        stops within max_distance km of it in a StopIndex, at walking_speed
+        km/h.
+        """
+
+        for stop in list(self.stops.values()):
+            for other, distance in stop_index.within(stop, max_distance):
+                if stop_key(other) == stop_key(stop):
+                    continue
+                seconds = int(distance / walking_speed * 60 * 60)
+                self.add_transfer(stop, other, seconds, both_ways=False)
+
+    @classmethod
+    def sample(cls, client, stops, limit=5, workers=8, **kwargs):
+        """Build a graph from the runs departing from some stops: the next
+        limit departures from each stop, then the stopping pattern of each
+        of those runs.
+        """
+
+        graph = cls(**kwargs)
+        graph.extend(client, stops, limit=limit, workers=workers)
+        return graph
+
+    def extend(self, client, stops, limit=5, workers=8):
+        """ add the runs departing from some more stops, see sample """
+
+        jobs = []
+        for stop_id, departures, error in \
+                client.broad_next_departures_many(stops, limit=limit,
+                                                  workers=workers):
+            if error is not None:
+                continue
+            for departure in departures:
+                run = departure['run']
+                key = (run.transport_type, run.run_id)
+                if key in self._runs:
+                    continue
+                self._runs.add(key)
+                jobs.append((key, (run, departure['platform'].stop)))
+
+        def fetch(job):
+            run, stop = job
+            return client.stopping_pattern(mode=run.transport_type,
+                                           run=run.run_id, stop=stop.stop_id)
+
+        for _, departures, error in client._fan_out(fetch, jobs, workers):
+            if error is None:
+                self.add_stopping_pattern(departures)
+
+    def _sort(self):
+        if not self._sorted:
+            self._connections.sort(key=lambda c: (c.departs, c.arrives))
+            self._departs = [c.departs for c in self._connections]
+            self._sorted = True
+
+    def earliest_arrival(self, origin, destination, depart_after):
+        """The journey that gets from origin to destination soonest.
+
+        Arguments:
+            origin: Stop to start from
+            destination: Stop to get to
+            depart_after: timezone aware datetime to leave origin from
+        Returns:
+            a list of Legs (empty if origin is destination), or None if
+            destination can't be reached
+        """
+
+        source = stop_key(origin)
+        target = stop_key(destination)
+        if source == target:
+            return []
+
+        self._sort()
+        start = _epoch(depart_after)
+
+        arrival = {source: start}
+        # how each stop was best reached: ('run', boarded, alighted) or
+        # ('walk', from stop, seconds)
+        reached_by = {}
+        boarded = {}
+
+        def walk_from(key, when):
+            for other, seconds in self._transfers.get(key, ()):
+                if when + seconds < arrival.get(other, INFINITY):
+                    arrival[other] = when + seconds
+                    reached_by[other] = ('walk', key, seconds)
+
+        walk_from(source, start)
+
+        connections = self._connections
+        for i in range(bisect_left(self._departs, start), len(connections)):
+            connection = connections[i]
+            if arrival.get(target, INFINITY) <= connection.departs:
+                break
+
+            run = (connection.run.transport_type, connection.run.run_id)
+            if run not in boarded:
+                here = connection.departure_stop
+                ready = arrival.get(here, INFINITY)
+                if here != source or reached_by.get(here) is not None:
+                    ready += self.min_transfer
+                if ready > connection.departs:
+                    continue
+                boarded[run] = connection
+
+            there = connection.arrival_stop
+            if connection.arrives < arrival.get(there, INFINITY):
+                arrival[there] = connection.arrives
+                reached_by[there] = ('run', boarded[run], connection)
+                walk_from(there, connection.arrives)
+
+        if target not in reached_by:
+            return None
+
+        legs = []
+        key = target
+        while key != source:
+            how = reached_by[key]
+            if how[0] == 'walk':
+                _, previous, seconds = how
+                legs.append(Leg(None, None, self.stops[previous],
+                                self.stops[key], None, None))
+                key = previous
+            else:
+                _, first, last = how
+                legs.append(Leg(last.run, last.line,
+                                self.stops[first.departure_stop],
+                                self.stops[last.arrival_stop],
+                                first.departure_time, last.arrival_time))
+                key = first.departure_stop
+
+        legs.reverse()
+        return legs
@@ -3,6 +3,9 @@ from pyptv.factory import TypeFactory
 
 class Line(object):
 
+    __slots__ = ('line_id', 'line_name', 'line_number', '_client',
+                 '__weakref__')
+
     @property
     def transport_type(self):
         raise NotImplementedError
@@ -21,29 +24,40 @@ class Line(object):
         return self._client.stops_on_a_line(mode=self.transport_type,
                                             line=self.line_id)
 
+    def stops_async(self):
+        """ stops, on an AsyncPTVClient's pool """
+        return self._client.run_async(self.stops)
+
 
 class TramLine(Line):
+    __slots__ = ()
     transport_type = "tram"
 
 
 class TrainLine(Line):
+    __slots__ = ()
     transport_type = "train"
 
 
 class BusLine(Line):
+    __slots__ = ()
     transport_type = "bus"
 
 
 class VlineLine(Line):
+    __slots__ = ()
     transport_type = "vline"
 
 
 class NightriderLine(Line):
+    __slots__ = ()
     transport_type = "nightrider"
 
 
 class LineFactory(TypeFactory):
 
+    identity = 'line_id'
+
     classes = {'train': TrainLine,
                'tram': TramLine,
                'bus': BusLine,
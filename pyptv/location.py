@@ -4,8 +4,30 @@ from math import sin, cos, sqrt, asin, atan2, radians, degrees
 EARTH_RADIUS = 6373.0  # KM
 
 
+def haversine(lat1, lon1, lat2, lon2):
+    """ Distance (in km) between two points given in degrees """
+
+    # calculation adapted from:
+    # http://stackoverflow.com/questions/19412462/getting-distance-between-two-points-based-on-latitude-longitude-python
+
+    rlat1 = radians(lat1)
+    rlon1 = radians(lon1)
+    rlat2 = radians(lat2)
+    rlon2 = radians(lon2)
+
+    dlon = rlon2 - rlon1
+    dlat = rlat2 - rlat1
+
+    a = sin(dlat / 2)**2 + cos(rlat1) * cos(rlat2) * sin(dlon / 2)**2
+    c = 2 * atan2(sqrt(a), sqrt(1 - a))
+
+    return EARTH_RADIUS * c
+
+
 class Location(object):
 
+    __slots__ = ('lat', 'lon')
+
     def __init__(self, lat, lon):
         self.lat = lat
         self.lon = lon
@@ -34,23 +56,7 @@ class Location(object):
         lat1, lon1 = parse_location(self)
         lat2, lon2 = parse_location(location)
 
-        # calculation adapted from:
-        # http://stackoverflow.com/questions/19412462/getting-distance-between-two-points-based-on-latitude-longitude-python
-
-        rlat1 = radians(lat1)
-        rlon1 = radians(lon1)
-        rlat2 = radians(lat2)
-        rlon2 = radians(lon2)
-
-        dlon = rlon2 - rlon1
-        dlat = rlat2 - rlat1
-
-        a = sin(dlat / 2)**2 + cos(rlat1) * cos(rlat2) * sin(dlon / 2)**2
-        c = 2 * atan2(sqrt(a), sqrt(1 - a))
-
-        distance = EARTH_RADIUS * c
-
-        return distance
+        return haversine(lat1, lon1, lat2, lon2)
 
     def location_delta(self, distance, bearing):
         """ calculate the location after traving {distance} on {bearing} from
@@ -81,10 +87,16 @@ class Location(object):
 
 class LocationMixin(object):
 
+    __slots__ = ()
+
     def stops_nearby(self, *args, **kwargs):
         """ transit stops that are nearby this location """
         return self._client.stops_nearby(self.location, *args, **kwargs)
 
+    def stops_nearby_async(self, *args, **kwargs):
+        """ stops_nearby, on an AsyncPTVClient's pool """
+        return self._client.run_async(self.stops_nearby, *args, **kwargs)
+
     def poi_nearby(self, poi, radius, griddepth, limit=20, *args, **kwargs):
         """ Points of Interest that are within {radius} km of this one
         radius: defines the radius of a circle within a bounding square defined
@@ -102,6 +114,10 @@ class LocationMixin(object):
                                                   griddepth, limit,
                                                   *args, **kwargs)
 
+    def poi_nearby_async(self, *args, **kwargs):
+        """ poi_nearby, on an AsyncPTVClient's pool """
+        return self._client.run_async(self.poi_nearby, *args, **kwargs)
+
 
 def parse_location(location):
     """
@@ -121,7 +137,7 @@ def parse_location(location):
     if isinstance(location, Location):
         return (location.lat, location.lon)
 
-    if hasattr('location', location):
+    if hasattr(location, 'location'):
         return location.location.lat, location.location.lon
 
     raise Exception("location is not a supported type")
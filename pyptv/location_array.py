@@ -0,0 +1,151 @@
+try:
+    import numpy as np
+except ImportError:  # numpy is optional, only needed for LocationArray
+    np = None
+
+from pyptv.location import EARTH_RADIUS, Location, parse_location
+
+
+def _haversine(rlat1, rlon1, rlat2, rlon2):
+    """ the same calculation as location.haversine, on arrays of radians """
+
+    dlon = rlon2 - rlon1
+    dlat = rlat2 - rlat1
+
+    a = np.sin(dlat / 2)**2 + \
+        np.cos(rlat1) * np.cos(rlat2) * np.sin(dlon / 2)**2
+    c = 2 * np.arctan2(np.sqrt(a), np.sqrt(1 - a))
+
+    return EARTH_RADIUS * c
+
+
+class LocationArray(object):
+    """Many locations at once, for vectorised distance and bearing
+    calculations. Results match the scalar Location methods.
+
+    Requires numpy.
+
+    Arguments:
+        lats: sequence of latitudes in degrees
+        lons: sequence of longitudes in degrees
+    """
+
+    def __init__(self, lats, lons):
+        if np is None:
+            raise ImportError("LocationArray requires numpy")
+
+        self.lats = np.asarray(lats, dtype=np.float64)
+        self.lons = np.asarray(lons, dtype=np.float64)
+
+        if self.lats.shape != self.lons.shape:
+            raise ValueError("lats and lons must be the same length")
+
+        self._rlats = np.radians(self.lats)
+        self._rlons = np.radians(self.lons)
+
+    @classmethod
+    def from_locations(cls, locations):
+        """Build from anything parse_location understands, eg Stops"""
+
+        points = [parse_location(location) for location in locations]
+        lats = [lat for lat, lon in points]
+        lons = [lon for lat, lon in points]
+        return cls(lats, lons)
+
+    def __len__(self):
+        return len(self.lats)
+
+    def __getitem__(self, i):
+        return Location(float(self.lats[i]), float(self.lons[i]))
+
+    def __repr__(self):
+        return "<LocationArray: %s locations>" % len(self)
+
+    def distance(self, location):
+        """ distance (in km) from each location to a single location """
+
+        lat, lon = parse_location(location)
+
+        return _haversine(self._rlats, self._rlons,
+                          np.radians(lat), np.radians(lon))
+
+    def distance_matrix(self, other):
+        """Distance (in km) between every pair of locations.
+
+        Arguments:
+            other: another LocationArray
+        Returns:
+            array of shape (len(self), len(other))
+        """
+
+        return _haversine(self._rlats[:, np.newaxis],
+                          self._rlons[:, np.newaxis],
+                          other._rlats[np.newaxis, :],
+                          other._rlons[np.newaxis, :])
+
+    def location_delta(self, distance, bearing):
+        """Locations after travelling {distance} km on {bearing} degrees from
+        each location. distance and bearing can be single values or arrays
+        the same length as this one.
+
+        Returns:
+            a new LocationArray
+        """
+
+        rlat1 = self._rlats
+        rlon1 = self._rlons
+
+        rbearing = np.radians(bearing)
+        angular = np.asarray(distance, dtype=np.float64) / EARTH_RADIUS
+
+        rlat2 = np.arcsin(np.sin(rlat1) * np.cos(angular) +
+                          np.cos(rlat1) * np.sin(angular) * np.cos(rbearing))
+        rlon2 = rlon1 + np.arctan2(np.sin(rbearing) * np.sin(angular) *
+                                   np.cos(rlat1),
+                                   np.cos(angular) -
+                                   np.sin(rlat1) * np.sin(rlat2))
+
+        return LocationArray(np.degrees(rlat2), np.degrees(rlon2))
+
+    def nearest(self, location, k=1):
+        """The k locations closest to a single location.
+
+        Returns:
+            a tuple of (indices, distances) arrays, closest first
+        """
+
+        distances = self.distance(location)
+        indices, distances = _smallest_k(distances[np.newaxis, :], k)
+        return indices[0], distances[0]
+
+    def nearest_k(self, other, k=1):
+        """For each location in other, the k closest locations in this array.
+
+        Arguments:
+            other: another LocationArray (eg user positions)
+            k: number of neighbours
+        Returns:
+            a tuple of (indices, distances) arrays of shape (len(other), k),
+            closest first, where indices point into this array
+        """
+
+        distances = self.distance_matrix(other).T
+        return _smallest_k(distances, k)
+
+
+def _smallest_k(distances, k):
+    """ indices & values of the k smallest values in each row, in order """
+
+    k = min(k, distances.shape[1])
+    rows = np.arange(distances.shape[0])[:, np.newaxis]
+
+    if k < distances.shape[1]:
+        indices = np.argpartition(distances, k - 1, axis=1)[:, :k]
+    else:
+        indices = np.tile(np.arange(distances.shape[1]),
+                          (distances.shape[0], 1))
+
+    order = np.argsort(distances[rows, indices], axis=1, kind='mergesort')
+    indices = indices[rows, order]
+
+    return indices, distances[rows, indices]
@@ -0,0 +1,607 @@
+"""A stand in for the PTV timetable API, for load testing and benchmarking
+without the network.
+
+It checks the devid & signature of every request the same way the API does,
+and answers the /v2 end points PTVClient uses from a synthetic network, with
+configurable latency and error rate:
+
+    server = MockPTVServer(latency=0.05, error_rate=0.01).start()
+    client = PTVClient(DEFAULT_DEVELOPER_ID, DEFAULT_API_KEY,
+                       base_url=server.url)
+
+or from the command line:
+
+    python -m pyptv.mock_server --port 8000 --lines 50 --stops 40
+"""
+from BaseHTTPServer import BaseHTTPRequestHandler, HTTPServer
+import calendar
+import hmac
+from hashlib import sha1
+import json
+import math
+import random
+import re
+from SocketServer import ThreadingMixIn
+import threading
+import time
+import urlparse
+import urllib
+
+from pyptv.client import PTVClient
+from pyptv.disruption import DISRUPTION_MODES
+from pyptv.location import haversine, Location
+
+
+DEFAULT_DEVELOPER_ID = "1000000"
+DEFAULT_API_KEY = "mock-api-key"
+
+TIMESTAMP_FORMAT = "%Y-%m-%dT%H:%M:%SZ"
+
+MODE_NAMES = dict((mode_id, mode) for mode, mode_id in PTVClient.MODES.items())
+
+# seconds between stops
+TRAVEL_TIME = {"train": 150, "tram": 90, "bus": 120, "vline": 600,
+               "nightrider": 180}
+
+MELBOURNE = (-37.8136, 144.9631)
+
+STREETS = ["Sydney", "Lygon", "Nicholson", "Brunswick", "Smith", "Chapel",
+           "Glenferrie", "Burke", "Riversdale", "Toorak", "High", "Plenty",
+           "Bell", "Moreland", "Victoria", "Bridge", "Church", "Punt",
+           "Flemington", "Racecourse", "Mount Alexander", "Keilor"]
+
+CROSS_STREETS = ["Glenlyon", "Albert", "Union", "Hope", "Victoria", "Park",
+                 "Station", "Elizabeth", "Edward", "Stewart", "Barkly",
+                 "Weston", "Blyth", "Dawson", "Grantham", "Evans"]
+
+SUBURBS = ["Brunswick", "Coburg", "Fitzroy", "Carlton", "Richmond",
+           "Hawthorn", "Kew", "Camberwell", "Prahran", "Northcote",
+           "Preston", "Essendon", "Footscray", "St Kilda", "Collingwood"]
+
+
+def format_time(epoch):
+    return time.strftime(TIMESTAMP_FORMAT, time.gmtime(epoch))
+
+
+def parse_time(raw):
+    return calendar.timegm(time.strptime(raw, TIMESTAMP_FORMAT))
+
+
+class SyntheticNetwork(object):
+    """A made up but consistent transport network: lines radiating out from
+    a few hub stops near the city, each run every headway seconds in both
+    directions, with the same answers for the same seed.
+
+    Arguments:
+        modes: transport modes to make lines for
+        lines_per_mode: lines in each mode
+        stops_per_line: stops on each line
+        headway: seconds between runs of a line
+        seed: seed for the random layout
+    """
+
+    # runs of a line & direction are numbered from the epoch, and wrap around
+    # in their run_id after this many
+    RUNS_PER_SERVICE = 10 ** 6
+
+    def __init__(self, modes=("train", "tram", "bus"), lines_per_mode=10,
+                 stops_per_line=20, headway=10 * 60, seed=0):
+        self.headway = headway
+        self.created_at = int(time.time())
+
+        rng = random.Random(seed)
+
+        self.stops = {}
+        self.lines = {}
+        self.line_stops = {}
+        self.lines_at = {}
+        self.offsets = {}
+
+        for mode in modes:
+            mode_id = PTVClient.MODES[mode]
+            hubs = [self._add_stop(rng, mode, MELBOURNE[0], MELBOURNE[1],
+                                   spread=0.01) for _ in range(3)]
+            for i in range(lines_per_mode):
+                line_id = mode_id * 1000 + i + 1
+                self._add_line(rng, mode, line_id, rng.choice(hubs),
+                               stops_per_line)
+
+    def _add_stop(self, rng, mode, lat, lon, spread=0.0):
+        stop_id = len(self.stops) + 1
+        street = rng.choice(STREETS)
+        cross = rng.choice(CROSS_STREETS)
+        self.stops[stop_id] = {
+            "transport_type": mode,
+            "stop_id": stop_id,
+            "location_name": "%s St/%s Rd #%d" % (cross, street,
+                                                  stop_id % 60),
+            "suburb": rng.choice(SUBURBS),
+            "lat": round(lat + rng.uniform(-spread, spread), 6),
+            "lon": round(lon + rng.uniform(-spread, spread), 6),
+            "distance": 0.0,
+        }
+        return stop_id
+
+    def _add_line(self, rng, mode, line_id, hub, count):
+        stop_ids = [hub]
+        here = Location(self.stops[hub]["lat"], self.stops[hub]["lon"])
+        bearing = rng.uniform(0, 360)
+        for _ in range(count - 1):
+            bearing += rng.uniform(-20, 20)
+            here = here.location_delta(rng.uniform(0.3, 1.0), bearing)
+            stop_ids.append(self._add_stop(rng, mode, here.lat, here.lon))
+
+        terminus = self.stops[stop_ids[-1]]
+        self.lines[line_id] = {
+            "transport_type": mode,
+            "line_id": line_id,
+            "line_name": "%d - %s - City" % (line_id % 1000,
+                                             terminus["suburb"]),
+            "line_number": str(line_id % 1000),
+        }
+        self.line_stops[line_id] = stop_ids
+        self.offsets[line_id] = rng.randint(0, self.headway - 1)
+        for position, stop_id in enumerate(stop_ids):
+            self.lines_at.setdefault(stop_id, []).append((line_id, position))
+
+    # runs
+
+    def _run_id(self, line_id, direction, trip):
+        return (line_id * 2 + direction) * self.RUNS_PER_SERVICE + \
+            trip % self.RUNS_PER_SERVICE
+
+    def _trip(self, run_id, now):
+        """ (line_id, direction, trip) of the run_id running closest to now """
+
+        service, wrapped = divmod(run_id, self.RUNS_PER_SERVICE)
+        line_id, direction = divmod(service, 2)
+        if line_id not in self.lines:
+            return None
+
+        current = int(now - self.offsets[line_id]) // self.headway
+        trip = current - (current - wrapped) % self.RUNS_PER_SERVICE
+        if current - trip > self.RUNS_PER_SERVICE // 2:
+            trip += self.RUNS_PER_SERVICE
+        return line_id, direction, trip
+
+    def _position(self, line_id, direction, index):
+        """ how many stops into its run a stop is, for a direction """
+        if direction == 0:
+            return index
+        return len(self.line_stops[line_id]) - 1 - index
+
+    def _departs(self, line_id, trip, position):
+        mode = self.lines[line_id]["transport_type"]
+        return trip * self.headway + self.offsets[line_id] + \
+            position * TRAVEL_TIME[mode]
+
+    def _departure(self, line_id, direction, trip, index, now):
+        stop_ids = self.line_stops[line_id]
+        line = self.lines[line_id]
+        mode = line["transport_type"]
+        terminus = self.stops[stop_ids[-1] if direction == 0 else stop_ids[0]]
+        # lines run out from the city and back in to it
+        destination = terminus["suburb"] if direction == 0 else "City"
+        run_id = self._run_id(line_id, direction, trip)
+
+        departs = self._departs(line_id, trip,
+                                self._position(line_id, direction, index))
+
+        # realtime predictions only for the next hour, up to a few minutes
+        # either way of the timetable
+        realtime = None
+        if now - 5 * 60 <= departs <= now + 60 * 60:
+            realtime = format_time(departs + run_id * 7919 % 301 - 60)
+
+        return {"platform": {"realtime_id": 0,
+                             "stop": dict(self.stops[stop_ids[index]]),
+                             "direction": {"linedir_id": line_id * 2 +
+                                           direction,
+                                           "direction_id": line_id * 2 +
+                                           direction,
+                                           "direction_name": destination,
+                                           "line": dict(line)}},
+                "run": {"transport_type": mode,
+                        "run_id": run_id,
+                        "num_skipped": 0,
+                        "destination_id": terminus["stop_id"],
+                        "destination_name": destination},
+                "time_timetable_utc": format_time(departs),
+                "time_realtime_utc": realtime,
+                "flags": "",
+                }
+
+    def departures(self, stop_id, limit, now, line_id=None, direction=None):
+        """ the next limit departures of each line & direction at a stop """
+
+        out = []
+        for at_line, index in self.lines_at.get(stop_id, ()):
+            if line_id is not None and at_line != line_id:
+                continue
+            last = len(self.line_stops[at_line]) - 1
+            for at_direction in (0, 1):
+                if direction is not None and at_direction != direction:
+                    continue
+                position = self._position(at_line, at_direction, index)
+                if position == last:
+                    continue  # runs terminate here
+                first = self._departs(at_line, 0, position)
+                trip = int(math.ceil(float(now - first) / self.headway))
+                for k in range(trip, trip + limit):
+                    out.append(self._departure(at_line, at_direction, k,
+                                               index, now))
+
+        out.sort(key=lambda d: d["time_timetable_utc"])
+        return out
+
+    def stopping_pattern(self, run_id, now):
+        trip = self._trip(run_id, now)
+        if trip is None:
+            return None
+        line_id, direction, trip = trip
+        out = [self._departure(line_id, direction, trip, index, now)
+               for index in range(len(self.line_stops[line_id]))]
+        out.sort(key=lambda d: d["time_timetable_utc"])
+        return out
+
+    # everything else
+
+    def lines_by_mode(self, mode, name=None):
+        out = [line for line in self.lines.values()
+               if line["transport_type"] == mode]
+        if name is not None:
+            out = [line for line in out
+                   if name.lower() in line["line_name"].lower()]
+        return sorted(out, key=lambda line: line["line_id"])
+
+    def stops_on_a_line(self, line_id):
+        return [self.stops[stop_id] for stop_id in self.line_stops[line_id]]
+
+    def _with_distance(self, stop, lat, lon):
+        stop = dict(stop)
+        stop["distance"] = haversine(lat, lon, stop["lat"], stop["lon"])
+        return stop
+
+    def nearme(self, lat, lon, limit=30):
+        stops = [self._with_distance(stop, lat, lon)
+                 for stop in self.stops.values()]
+        stops.sort(key=lambda stop: stop["distance"])
+        return [{"result": stop, "type": "stop"} for stop in stops[:limit]]
+
+    def pois(self, modes, lat1, lon1, lat2, lon2, limit):
+        south, north = min(lat1, lat2), max(lat1, lat2)
+        west, east = min(lon1, lon2), max(lon1, lon2)
+        found = [stop for stop in self.stops.values()
+                 if stop["transport_type"] in modes and
+                 south <= stop["lat"] <= north and
+                 west <= stop["lon"] <= east]
+        found.sort(key=lambda stop: stop["stop_id"])
+
+        out = {"minLat": south, "maxLat": north,
+               "minLong": west, "maxLong": east,
+               "totalLocations": len(found),
+               "locations": found[:limit],
+               }
+        if found:
+            out["weightedLat"] = sum(s["lat"] for s in found) / len(found)
+            out["weightedLong"] = sum(s["lon"] for s in found) / len(found)
+        return out
+
+    def search(self, term):
+        term = term.lower()
+        out = [{"result": stop, "type": "stop"}
+               for stop in self.stops.values()
+               if term in stop["location_name"].lower() or
+               term in stop["suburb"].lower()]
+        out.extend({"result": line, "type": "line"}
+                   for line in self.lines.values()
+                   if term in line["line_name"].lower() or
+                   term == line["line_number"])
+        return out
+
+    def disruptions(self, modes):
+        out = {}
+        for name in modes:
+            transport_types = DISRUPTION_MODES.get(name)
+            lines = sorted(line_id for line_id, line in self.lines.items()
+                           if transport_types is None or
+                           line["transport_type"] in transport_types)
+            items = []
+            for line_id in lines[:2]:
+                line = self.lines[line_id]
+                items.append({
+                    "title": "Route %s: delays" % line["line_number"],
+                    "description": "Delays of up to 20 minutes on the %s "
+                                   "line due to an earlier incident." %
+                                   line["line_name"],
+                    "url": "http://ptv.vic.gov.au/disruptions/%d" % line_id,
+                    "publishedOn": format_time(self.created_at),
+                })
+            out[name] = items
+        return out
+
+
+class MockAPIHandler(BaseHTTPRequestHandler):
+
+    # keep connections open, like the real API, for pooled transports
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            BaseHTTPRequestHandler.log_message(self, format, *args)
+
+    def do_GET(self):
+        status, body, content_type = self.server.respond(self.path)
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+class MockPTVServer(ThreadingMixIn, HTTPServer):
+    """Threaded HTTP server answering PTV API requests from a
+    SyntheticNetwork.
+
+    Arguments:
+        address: (host, port) to listen on, port 0 picks a free one
+        network: (optional) the SyntheticNetwork to serve
+        developers: (optional) {devid: api key} of the developers allowed
+            in, defaults to DEFAULT_DEVELOPER_ID with DEFAULT_API_KEY
+        latency: seconds to wait before answering each request
+        jitter: up to this many more seconds at random on top of latency
+        error_rate: fraction of requests answered with a 500 error page
+        max_skew: (optional) reject requests whose timestamp is more than
+            this many seconds from the server's clock
+        seed: (optional) seed for latency jitter & errors
+        verbose: log each request
+    """
+
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, address=("127.0.0.1", 0), network=None,
+                 developers=None, latency=0.0, jitter=0.0, error_rate=0.0,
+                 max_skew=None, seed=None, verbose=False):
+        HTTPServer.__init__(self, address, MockAPIHandler)
+
+        if network is None:
+            network = SyntheticNetwork()
+        if developers is None:
+            developers = {DEFAULT_DEVELOPER_ID: DEFAULT_API_KEY}
+
+        self.network = network
+        self.developers = developers
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.max_skew = max_skew
+        self.verbose = verbose
+
+        self.url = "http://%s:%d/" % self.server_address[:2]
+
+        self._random = random.Random(seed)
+        self._thread = None
+        self._lock = threading.Lock()
+        self._stats = {"requests": 0, "rejected": 0, "errors": 0,
+                       "not_found": 0}
+
+        self._routes = [
+            (re.compile(pattern + "$"), getattr(self, name))
+            for pattern, name in [
+                (r"/v2/healthcheck", "_healthcheck"),
+                (r"/v2/nearme/latitude/([-0-9.]+)/longitude/([-0-9.]+)",
+                 "_nearme"),
+                (r"/v2/poi/([0-9,]+)/lat1/([-0-9.]+)/long1/([-0-9.]+)/"
+                 r"lat2/([-0-9.]+)/long2/([-0-9.]+)/"
+                 r"griddepth/(\d+)/limit/(\d+)", "_pois"),
+                (r"/v2/search/(.+)", "_search"),
+                (r"/v2/lines/mode/(\d+)", "_lines_by_mode"),
+                (r"/v2/mode/(\d+)/line/(\d+)/stops-for-line",
+                 "_stops_on_a_line"),
+                (r"/v2/mode/(\d+)/stop/(\d+)/departures/by-destination/"
+                 r"limit/(\d+)", "_broad_next_departures"),
+                (r"/v2/mode/(\d+)/line/(\d+)/stop/(\d+)/directionid/(\d+)/"
+                 r"departures/all/limit/(\d+)", "_specific_next_departures"),
+                (r"/v2/mode/(\d+)/run/(\d+)/stop/(\d+)/stopping-pattern",
+                 "_stopping_pattern"),
+                (r"/v2/disruptions/modes/(.+)", "_disruptions"),
+            ]]
+
+    def start(self):
+        """ serve requests from a background thread """
+        self._thread = threading.Thread(target=self.serve_forever)
+        self._thread.daemon = True
+        self._thread.start()
+        return self
+
+    def stop(self):
+        if self._thread is not None:
+            self.shutdown()
+            self._thread = None
+        self.server_close()
+
+    def stats(self):
+        """Counts of requests served, rejected for a bad devid or signature,
+        answered with an injected error, and for unknown paths.
+        """
+        with self._lock:
+            return dict(self._stats)
+
+    def _count(self, name):
+        with self._lock:
+            self._stats[name] += 1
+
+    def verify(self, raw_path):
+        """Check a request's devid & signature (and timestamp, with
+        max_skew), returning None if it's fine or why it isn't.
+
+        The signature is the HMAC-SHA1, keyed with the developer's api key,
+        of the path & query up to the signature parameter.
+        """
+
+        raw_query = raw_path.partition("?")[2]
+        params = dict(urlparse.parse_qsl(raw_query))
+
+        devid = params.get("devid")
+        signature = params.get("signature")
+        if devid is None or signature is None:
+            return "devid and signature are required"
+
+        key = self.developers.get(devid)
+        if key is None:
+            return "unknown devid"
+
+        # as sent, rather than re-encoded, which could differ from what the
+        # client signed
+        unsigned, _, sent = raw_path.rpartition("&signature=")
+        if not unsigned:
+            return "signature must be the last parameter"
+        expected = hmac.new(key, unsigned, sha1).hexdigest()
+        if expected.upper() != sent.upper():
+            return "invalid signature"
+
+        if self.max_skew is not None and "timestamp" in params:
+            try:
+                skew = abs(time.time() - parse_time(params["timestamp"]))
+            except ValueError:
+                return "invalid timestamp"
+            if skew > self.max_skew:
+                return "timestamp is too far from the server's clock"
+
+        return None
+
+    def respond(self, raw_path):
+        """ (status, body, content type) for a request """
+
+        self._count("requests")
+
+        delay = self.latency
+        if self.jitter:
+            delay += self._random.uniform(0, self.jitter)
+        if delay:
+            time.sleep(delay)
+
+        problem = self.verify(raw_path)
+        if problem is not None:
+            self._count("rejected")
+            return 403, json.dumps({"message": problem}), "application/json"
+
+        if self.error_rate and self._random.random() < self.error_rate:
+            self._count("errors")
+            return (500, "<html><head><title>Runtime Error</title></head>"
+                         "<body><h1>Server Error</h1></body></html>",
+                    "text/html")
+
+        path, _, raw_query = raw_path.partition("?")
+        params = dict(urlparse.parse_qsl(raw_query))
+        now = time.time()
+        if "for_utc" in params:
+            try:
+                now = parse_time(params["for_utc"])
+            except ValueError:
+                pass
+
+        for pattern, handler in self._routes:
+            match = pattern.match(path)
+            if match is None:
+                continue
+            args = [urllib.unquote(arg) for arg in match.groups()]
+            data = handler(now, params, *args)
+            if data is not None:
+                return 200, json.dumps(data), "application/json"
+            break
+
+        self._count("not_found")
+        return 404, json.dumps({"message": "not found"}), "application/json"
+
+    # end points, returning None for anything that doesn't exist
+
+    def _healthcheck(self, now, params):
+        clock_ok = True
+        if "timestamp" in params:
+            try:
+                clock_ok = abs(now - parse_time(params["timestamp"])) < 300
+            except ValueError:
+                clock_ok = False
+        return {"securityTokenOK": True, "clientClockOK": clock_ok,
+                "memcacheOK": True, "databaseOK": True}
+
+    def _nearme(self, now, params, lat, lon):
+        return self.network.nearme(float(lat), float(lon))
+
+    def _pois(self, now, params, pois, lat1, lon1, lat2, lon2, griddepth,
+              limit):
+        modes = [MODE_NAMES.get(int(poi)) for poi in pois.split(",")]
+        return self.network.pois(modes, float(lat1), float(lon1),
+                                 float(lat2), float(lon2), int(limit))
+
+    def _search(self, now, params, term):
+        return self.network.search(term)
+
+    def _lines_by_mode(self, now, params, mode_id):
+        return self.network.lines_by_mode(MODE_NAMES.get(int(mode_id)),
+                                          params.get("name"))
+
+    def _stops_on_a_line(self, now, params, mode_id, line_id):
+        if int(line_id) not in self.network.lines:
+            return None
+        return self.network.stops_on_a_line(int(line_id))
+
+    def _broad_next_departures(self, now, params, mode_id, stop_id, limit):
+        return {"values": self.network.departures(int(stop_id), int(limit),
+                                                  now)}
+
+    def _specific_next_departures(self, now, params, mode_id, line_id,
+                                  stop_id, direction_id, limit):
+        line_id, direction = divmod(int(direction_id), 2)
+        return {"values": self.network.departures(int(stop_id), int(limit),
+                                                  now, line_id=line_id,
+                                                  direction=direction)}
+
+    def _stopping_pattern(self, now, params, mode_id, run_id, stop_id):
+        values = self.network.stopping_pattern(int(run_id), now)
+        if values is None:
+            return None
+        return {"values": values}
+
+    def _disruptions(self, now, params, modes):
+        return self.network.disruptions(modes.split(","))
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--devid", default=DEFAULT_DEVELOPER_ID)
+    parser.add_argument("--key", default=DEFAULT_API_KEY)
+    parser.add_argument("--lines", type=int, default=10,
+                        help="lines per transport mode")
+    parser.add_argument("--stops", type=int, default=20,
+                        help="stops per line")
+    parser.add_argument("--latency", type=float, default=0.0)
+    parser.add_argument("--jitter", type=float, default=0.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--verbose", action="store_true")
+    args = parser.parse_args()
+
+    network = SyntheticNetwork(lines_per_mode=args.lines,
+                               stops_per_line=args.stops, seed=args.seed)
+    server = MockPTVServer((args.host, args.port), network=network,
+                           developers={args.devid: args.key},
+                           latency=args.latency, jitter=args.jitter,
+                           error_rate=args.error_rate, seed=args.seed,
+                           verbose=args.verbose)
+    print("serving %d stops on %d lines at %s" % (
+        len(network.stops), len(network.lines), server.url))
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
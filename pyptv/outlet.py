@@ -4,6 +4,9 @@ from pyptv.location import Location, LocationMixin
 
 class Outlet(LocationMixin):
 
+    __slots__ = ('location', 'location_name', 'subrub', 'business_name',
+                 '_client')
+
     @property
     def transport_type(self):
         raise NotImplementedError
@@ -20,10 +23,12 @@ class Outlet(LocationMixin):
 
 
 class RetailOutlet(Outlet):
+    __slots__ = ()
     transport_type = "Retail"
 
 
 class StopOutlet(Outlet):
+    __slots__ = ()
     transport_type = "Stop"
 
 
@@ -1,6 +1,8 @@
 
 class Platform(object):
 
+    __slots__ = ('direction', 'stop', 'realtime_id')
+
     def __repr__(self):
         return "<Platform: %s>" % self.stop.location_name
 
@@ -14,3 +16,18 @@ class Platform(object):
         direction_id = self.direction.direction_id
         return self.stop.specific_next_departures(line_id, direction_id,
                                                   for_utc=None)
+
+    def specific_next_departures_async(self, for_utc=None):
+        """ specific_next_departures, on an AsyncPTVClient's pool """
+        return self.stop._client.run_async(self.specific_next_departures,
+                                           for_utc=for_utc)
+
+    def watch_departures(self, limit=5, **kwargs):
+        """Poll departures for this platform's line and direction and yield
+        DepartureEvents as they change.
+        """
+
+        line_id = self.direction.line.line_id
+        direction_id = self.direction.direction_id
+        return self.stop.watch_departures(line_id, direction_id, limit=limit,
+                                          **kwargs)
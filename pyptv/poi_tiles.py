@@ -0,0 +1,290 @@
+from collections import OrderedDict
+from math import asinh, atan, cos, degrees, floor, pi, radians, sinh, tan
+import threading
+import time
+
+from pyptv.cache import DAY
+from pyptv.client import POI_PATH
+
+
+# the web mercator projection doesn't reach the poles
+MAX_LATITUDE = 85.0511287798
+
+
+def tile_for(lat, lon, zoom):
+    """ (x, y) of the slippy map tile holding a point at a zoom level """
+
+    n = 2 ** zoom
+    lat = max(min(lat, MAX_LATITUDE), -MAX_LATITUDE)
+    x = int(floor((lon + 180.0) / 360.0 * n))
+    y = int(floor((1.0 - asinh(tan(radians(lat))) / pi) / 2.0 * n))
+    return min(max(x, 0), n - 1), min(max(y, 0), n - 1)
+
+
+def tile_bounds(zoom, x, y):
+    """ (south, west, north, east) edges of a slippy map tile """
+
+    n = float(2 ** zoom)
+    west = x / n * 360.0 - 180.0
+    east = (x + 1) / n * 360.0 - 180.0
+    north = degrees(atan(sinh(pi * (1 - 2 * y / n))))
+    south = degrees(atan(sinh(pi * (1 - 2 * (y + 1) / n))))
+    return south, west, north, east
+
+
+def _poi_key(poi):
+    """ what tells a Stop or Outlet apart from the same one in another tile """
+    if hasattr(poi, 'stop_id'):
+        return (poi.transport_type, poi.stop_id)
+    return (poi.transport_type, poi.business_name, poi.location.lat,
+            poi.location.lon)
+
+
+class POITiles(object):
+    """Answers transport_pois_by_map from points of interest fetched & cached
+    one map tile at a time, see PTVClient's poi_tiles argument.
+
+    A map's bounding box is snapped to the tiles of a slippy map (web
+    mercator) pyramid covering it, at the most detailed zoom level where
+    that takes at most max_tiles tiles. Tiles that aren't cached are fetched
+    from the API concurrently, and the points of interest within the box are
+    then trimmed & clustered locally, so that maps panned over the same area
+    are mostly answered from memory. Boxes that would take more than
+    max_tiles tiles even at min_zoom aren't tiled (see covers), the client
+    sends them to the API as one request.
+
+    Locally, griddepth splits the box into griddepth x griddepth cells, and
+    the points of interest in a cell holding at least limit of them are
+    returned as one entry of 'clusters' rather than in 'locations'. At most
+    limit 'locations' are returned, nearest the middle of the box first.
+
+    Arguments:
+        min_zoom: least detailed zoom level to use
+        max_zoom: most detailed zoom level to use
+        max_tiles: most tiles to cover a box with
+        tile_limit: limit to fetch each tile with. A tile that comes back
+            with more points of interest than that is fetched again as the
+            four tiles of the next zoom level
+        ttl: seconds that a cached tile stays fresh for
+        max_cached: most tiles to hold, the least recently used are evicted
+        workers: number of tiles to fetch at once
+    """
+
+    def __init__(self, min_zoom=11, max_zoom=15, max_tiles=16,
+                 tile_limit=1000, ttl=DAY, max_cached=4096, workers=8):
+        self.min_zoom = min_zoom
+        self.max_zoom = max_zoom
+        self.max_tiles = max_tiles
+        self.tile_limit = tile_limit
+        self.ttl = ttl
+        self.max_cached = max_cached
+        self.workers = workers
+
+        # (poi id, zoom, x, y) -> (expires, [(key, lat, lon, Stop/Outlet)])
+        self._tiles = OrderedDict()
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self._tiles)
+
+    def clear(self):
+        with self._lock:
+            self._tiles.clear()
+
+    # the pyramid
+
+    def zoom_for(self, south, west, north, east):
+        """The zoom level to cover a bounding box at, or None if it would take
+        more than max_tiles tiles even at min_zoom.
+        """
+
+        for zoom in range(self.max_zoom, self.min_zoom - 1, -1):
+            if self._count(south, west, north, east, zoom) <= self.max_tiles:
+                return zoom
+        return None
+
+    def _count(self, south, west, north, east, zoom):
+        x1, y1 = tile_for(north, west, zoom)
+        x2, y2 = tile_for(south, east, zoom)
+        return (x2 - x1 + 1) * (y2 - y1 + 1)
+
+    def covers(self, lat1, lon1, lat2, lon2):
+        """ whether a bounding box is small enough to answer from tiles """
+        return self.zoom_for(min(lat1, lat2), min(lon1, lon2),
+                             max(lat1, lat2), max(lon1, lon2)) is not None
+
+    def tiles_for(self, south, west, north, east, zoom):
+        """ (x, y) of each tile covering a bounding box at a zoom level """
+
+        # y counts down from the north
+        x1, y1 = tile_for(north, west, zoom)
+        x2, y2 = tile_for(south, east, zoom)
+        return [(x, y) for x in range(x1, x2 + 1) for y in range(y1, y2 + 1)]
+
+    # the cache
+
+    def _get(self, key):
+        with self._lock:
+            entry = self._tiles.get(key)
+            if entry is None or entry[0] < time.time():
+                self.misses += 1
+                return None
+            self._tiles[key] = self._tiles.pop(key)  # most recently used
+            self.hits += 1
+            return entry[1]
+
+    def _put(self, key, pois):
+        with self._lock:
+            self._tiles.pop(key, None)
+            self._tiles[key] = (time.time() + self.ttl, pois)
+            while len(self._tiles) > self.max_cached:
+                self._tiles.popitem(last=False)
+
+    def _fetch_tile(self, client, key):
+        """ the points of interest in a tile, from the API """
+
+        poi_id, zoom, x, y = key
+        south, west, north, east = tile_bounds(zoom, x, y)
+
+        path = POI_PATH.render(poi_id, north, west, south, east, 0,
+                               self.tile_limit)
+        data = client._api_request(path, endpoint="transport_pois_by_map")
+        locations = data.get("locations") or []
+
+        total = data.get("totalLocations", len(locations))
+        if total > len(locations) and zoom < self.max_zoom:
+            # truncated, so split it up
+            pois = []
+            for child_x in (2 * x, 2 * x + 1):
+                for child_y in (2 * y, 2 * y + 1):
+                    child = (poi_id, zoom + 1, child_x, child_y)
+                    pois.extend(self._tile(client, child))
+            return pois
+
+        return [(_poi_key(poi), poi.location.lat, poi.location.lon, poi)
+                for poi in client._process_pois(locations)]
+
+    def _tile(self, client, key):
+        pois = self._get(key)
+        if pois is None:
+            pois = self._fill(client, key)
+        return pois
+
+    def _fill(self, client, key):
+        pois = self._fetch_tile(client, key)
+        self._put(key, pois)
+        return pois
+
+    # answering
+
+    def query(self, client, poi_ids, lat1, lon1, lat2, lon2, griddepth,
+              limit):
+        """Answer transport_pois_by_map for a bounding box.
+
+        Arguments:
+            client: PTVClient to fetch missing tiles with
+            poi_ids: the API's ids of the poi types to include
+            lat1, lon1, lat2, lon2: opposite corners of the box
+            griddepth: number of cells along each side of the box to cluster
+                points of interest in, 0 for no clustering
+            limit: minimum points of interest in a cell to cluster them, and
+                the most locations to return
+        Returns:
+            a dictionary in the same format as transport_pois_by_map, with
+            any clusters under 'clusters'
+        Raises:
+            ValueError if the box is too big for the tiles, see covers
+        """
+
+        south, north = min(lat1, lat2), max(lat1, lat2)
+        west, east = min(lon1, lon2), max(lon1, lon2)
+
+        zoom = self.zoom_for(south, west, north, east)
+        if zoom is None:
+            raise ValueError("bounding box needs more than %d tiles at zoom "
+                             "%d" % (self.max_tiles, self.min_zoom))
+        tiles = self.tiles_for(south, west, north, east, zoom)
+        keys = [(poi_id, zoom, x, y) for poi_id in poi_ids for x, y in tiles]
+
+        found = {}
+        missing = []
+        for key in keys:
+            pois = self._get(key)
+            if pois is None:
+                missing.append((key, key))
+            else:
+                self._collect(found, pois, south, west, north, east)
+
+        if len(missing) == 1:
+            key = missing[0][0]
+            self._collect(found, self._fill(client, key),
+                          south, west, north, east)
+        elif missing:
+            errors = []
+            for key, pois, error in client._fan_out(
+                    lambda key: self._fill(client, key), missing,
+                    self.workers):
+                if error is not None:
+                    errors.append(error)
+                else:
+                    self._collect(found, pois, south, west, north, east)
+            if errors:
+                raise errors[0]
+
+        return self._summarise(found.values(), south, west, north, east,
+                               griddepth, limit)
+
+    def _collect(self, found, pois, south, west, north, east):
+        for entry in pois:
+            if south <= entry[1] <= north and west <= entry[2] <= east:
+                found[entry[0]] = entry
+
+    def _summarise(self, found, south, west, north, east, griddepth, limit):
+        """ trim & cluster the points of interest within a box """
+
+        found = list(found)
+
+        out = {"minLat": south, "maxLat": north,
+               "minLong": west, "maxLong": east,
+               "totalLocations": len(found),
+               }
+        if found:
+            out["weightedLat"] = sum(e[1] for e in found) / len(found)
+            out["weightedLong"] = sum(e[2] for e in found) / len(found)
+
+        clusters = []
+        if griddepth and limit and found:
+            cell_lat = (north - south) / griddepth or 1.0
+            cell_lon = (east - west) / griddepth or 1.0
+
+            cells = {}
+            for entry in found:
+                row = min(int((entry[1] - south) / cell_lat), griddepth - 1)
+                col = min(int((entry[2] - west) / cell_lon), griddepth - 1)
+                cells.setdefault((row, col), []).append(entry)
+
+            found = []
+            for cell, entries in sorted(cells.items()):
+                if len(entries) < limit:
+                    found.extend(entries)
+                    continue
+                clusters.append({
+                    "weightedLat": sum(e[1] for e in entries) / len(entries),
+                    "weightedLong": sum(e[2] for e in entries) / len(entries),
+                    "totalLocations": len(entries),
+                })
+            out["clusters"] = clusters
+
+        mid_lat = (south + north) / 2.0
+        mid_lon = (west + east) / 2.0
+        scale = cos(radians(mid_lat)) ** 2
+        found.sort(key=lambda e: (e[1] - mid_lat) ** 2 +
+                   scale * (e[2] - mid_lon) ** 2)
+        if limit:
+            found = found[:limit]
+
+        out["locations"] = [entry[3] for entry in found]
+        return out
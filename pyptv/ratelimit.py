@@ -0,0 +1,125 @@
+import heapq
+import itertools
+import threading
+import time
+
+
+# priority classes, lower goes first
+INTERACTIVE = 0
+BACKGROUND = 1
+BULK = 2
+
+PRIORITY_NAMES = {INTERACTIVE: "interactive",
+                  BACKGROUND: "background",
+                  BULK: "bulk",
+                  }
+
+# default priority of each API end point
+ENDPOINT_PRIORITIES = {"healthcheck": INTERACTIVE,
+                       "stops_nearby": INTERACTIVE,
+                       "search": INTERACTIVE,
+                       "broad_next_departures": INTERACTIVE,
+                       "specific_next_departures": INTERACTIVE,
+                       "specific_next_departures_gtfs": INTERACTIVE,
+                       "stopping_pattern": INTERACTIVE,
+                       "transport_pois_by_map": BACKGROUND,
+                       "disruptions": BACKGROUND,
+                       "lines_by_mode": BULK,
+                       "stops_on_a_line": BULK,
+                       }
+
+
+class RateLimiter(object):
+    """Token bucket rate limiter that hands out tokens by priority.
+
+    Tokens accrue at rate per second, up to burst. Callers that have to wait
+    queue up, and whenever a token is available it goes to the waiting caller
+    with the best (lowest) priority, first come first served within a
+    priority.
+
+    Arguments:
+        rate: requests per second
+        burst: (optional) requests that can be sent at once after a quiet
+            period, defaults to rate
+    """
+
+    def __init__(self, rate, burst=None):
+        self.rate = float(rate)
+        self.burst = burst if burst is not None else max(1, rate)
+
+        self._cond = threading.Condition()
+        self._tokens = float(self.burst)
+        self._updated = time.time()
+        self._waiting = []
+        self._tickets = itertools.count()
+
+        self._acquired = dict((p, 0) for p in PRIORITY_NAMES)
+        self._wait_time = dict((p, 0.0) for p in PRIORITY_NAMES)
+        self._max_wait = dict((p, 0.0) for p in PRIORITY_NAMES)
+
+    def _refill(self):
+        now = time.time()
+        self._tokens = min(self.burst,
+                           self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def acquire(self, priority=BACKGROUND):
+        """ block until this caller may send a request """
+
+        start = time.time()
+        ticket = (priority, next(self._tickets))
+
+        with self._cond:
+            heapq.heappush(self._waiting, ticket)
+            try:
+                while True:
+                    self._refill()
+                    if self._waiting[0] == ticket:
+                        if self._tokens >= 1:
+                            break
+                        # first in line, sleep until the next token is due
+                        self._cond.wait((1 - self._tokens) / self.rate)
+                    else:
+                        self._cond.wait()
+            except BaseException:
+                self._waiting.remove(ticket)
+                heapq.heapify(self._waiting)
+                self._cond.notify_all()
+                raise
+
+            heapq.heappop(self._waiting)
+            self._tokens -= 1
+            # wake the rest so the next in line starts its countdown
+            self._cond.notify_all()
+
+            waited = time.time() - start
+            if priority in self._acquired:
+                self._acquired[priority] += 1
+                self._wait_time[priority] += waited
+                self._max_wait[priority] = max(self._max_wait[priority],
+                                               waited)
+
+    def queue_depth(self):
+        """ number of callers waiting, by priority name """
+        with self._cond:
+            depth = dict((name, 0) for name in PRIORITY_NAMES.values())
+            for priority, _ in self._waiting:
+                name = PRIORITY_NAMES.get(priority, priority)
+                depth[name] = depth.get(name, 0) + 1
+            return depth
+
+    def stats(self):
+        """Per priority counts of requests let through, and total & max
+        seconds spent waiting, plus the current queue depth.
+        """
+
+        depth = self.queue_depth()
+        with self._cond:
+            out = {}
+            for priority, name in PRIORITY_NAMES.items():
+                out[name] = {"acquired": self._acquired[priority],
+                             "wait_time": self._wait_time[priority],
+                             "max_wait": self._max_wait[priority],
+                             "queued": depth[name],
+                             }
+            return out
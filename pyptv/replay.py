@@ -0,0 +1,112 @@
+import json
+import os
+import threading
+import urlparse
+import urllib
+
+
+# query parameters that change with every request or identify the
+# developer, and are left out of fixture keys
+UNSTABLE_PARAMS = ("signature", "timestamp", "devid")
+
+
+class MissingFixture(LookupError):
+    """ a request was replayed that was never recorded """
+
+
+def request_key(url):
+    """Key for a signed request url, the path and query without the
+    signature, timestamp or developer id, e.g.
+    '/v2/mode/1/stop/2809/departures/by-destination/limit/5'
+    """
+
+    parsed = urlparse.urlparse(url)
+    query = [(k, v) for k, v in urlparse.parse_qsl(parsed.query)
+             if k not in UNSTABLE_PARAMS]
+    key = parsed.path
+    if query:
+        key += "?" + urllib.urlencode(sorted(query))
+    return key
+
+
+def load_fixtures(path):
+    """ {request key: body} recorded to a file by RecordingTransport """
+    with open(path) as f:
+        return json.load(f)
+
+
+class RecordingTransport(object):
+    """Transport that passes requests on to another transport and keeps each
+    response, so that they can be saved as fixtures and replayed offline by
+    ReplayTransport.
+
+    Responses are keyed by request_key, so nothing that signs a request is
+    saved.
+
+    Arguments:
+        transport: transport to send requests with, e.g. an HTTPTransport
+        path: (optional) file to save fixtures to, with save()
+    """
+
+    def __init__(self, transport, path=None):
+        self.transport = transport
+        self.path = path
+        self.fixtures = {}
+        self._lock = threading.Lock()
+
+    def get(self, url, timeout=None):
+        if timeout is None:
+            body = self.transport.get(url)
+        else:
+            body = self.transport.get(url, timeout=timeout)
+        with self._lock:
+            self.fixtures[request_key(url)] = body
+        return body
+
+    def save(self, path=None):
+        """ write the fixtures recorded so far to a file """
+
+        path = path or self.path
+        if path is None:
+            raise ValueError("no path to save fixtures to")
+
+        directory = os.path.dirname(path)
+        if directory and not os.path.isdir(directory):
+            os.makedirs(directory)
+
+        with self._lock:
+            fixtures = dict(self.fixtures)
+
+        with open(path, 'w') as f:
+            json.dump(fixtures, f, indent=1, sort_keys=True)
+
+
+class ReplayTransport(object):
+    """Transport that answers requests from recorded fixtures without
+    touching the network.
+
+    Arguments:
+        fixtures: a path to a file saved by RecordingTransport, or a
+            {request key: body} dictionary
+        fallback: (optional) transport to send requests that weren't
+            recorded to. Without one they raise MissingFixture
+    """
+
+    def __init__(self, fixtures, fallback=None):
+        if not isinstance(fixtures, dict):
+            fixtures = load_fixtures(fixtures)
+        self.fixtures = fixtures
+        self.fallback = fallback
+        self.requests = 0
+        self.misses = 0
+
+    def get(self, url, timeout=None):
+        self.requests += 1
+        key = request_key(url)
+        try:
+            return self.fixtures[key]
+        except KeyError:
+            self.misses += 1
+            if self.fallback is None:
+                raise MissingFixture(key)
+            return self.fallback.get(url, timeout=timeout)
@@ -0,0 +1,373 @@
+from collections import deque
+import heapq
+import itertools
+from multiprocessing.pool import ThreadPool
+import random
+import threading
+import time
+
+from pyptv.exceptions import APIError, CircuitOpenError
+
+
+# end points that share an upstream service, and so a circuit breaker. Any
+# end point not listed is a family of its own
+ENDPOINT_FAMILIES = {"broad_next_departures": "departures",
+                     "specific_next_departures": "departures",
+                     "specific_next_departures_gtfs": "departures",
+                     "stopping_pattern": "departures",
+                     "lines_by_mode": "network",
+                     "stops_on_a_line": "network",
+                     "stops_nearby": "locations",
+                     "transport_pois_by_map": "locations",
+                     }
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+def is_retryable(error):
+    """Whether a request that failed with error is worth sending again: a
+    connection problem, timeout or server side error, but not e.g. a bad
+    signature.
+    """
+
+    if isinstance(error, APIError):
+        return error.retryable
+    # socket errors and requests' ConnectionError & Timeout are all IOErrors
+    return isinstance(error, IOError)
+
+
+class CircuitBreaker(object):
+    """Stops sending requests to an end point family that keeps failing.
+
+    After failure_threshold failures in a row the circuit opens and calls
+    fail straight away with CircuitOpenError. After reset_timeout seconds one
+    trial call is let through (half open), which closes the circuit again if
+    it succeeds, or re-opens it if it fails.
+    """
+
+    def __init__(self, family, failure_threshold=5, reset_timeout=30):
+        self.family = family
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+
+        self.state = CLOSED
+        self.failures = 0
+        self.opened_at = None
+        self._trial = False
+        self._lock = threading.Lock()
+
+    def before_call(self):
+        """Raise CircuitOpenError if the call shouldn't be sent, otherwise
+        return whether it's the half open circuit's trial call.
+        """
+
+        with self._lock:
+            if self.state == CLOSED:
+                return False
+            retry_in = self.opened_at + self.reset_timeout - time.time()
+            if self.state == OPEN and retry_in <= 0:
+                self.state = HALF_OPEN
+            if self.state == HALF_OPEN and not self._trial:
+                self._trial = True
+                return True
+            raise CircuitOpenError(self.family, max(retry_in, 0))
+
+    def release(self):
+        """ let another trial call through, leaving the state as it is """
+        with self._lock:
+            self._trial = False
+
+    def succeeded(self):
+        with self._lock:
+            self.state = CLOSED
+            self.failures = 0
+            self._trial = False
+
+    def failed(self):
+        with self._lock:
+            self.failures += 1
+            self._trial = False
+            if self.state == HALF_OPEN or \
+                    self.failures >= self.failure_threshold:
+                self.state = OPEN
+                self.opened_at = time.time()
+
+
+class _Race(object):
+    """ the copies of one hedged request, the first to succeed wins """
+
+    def __init__(self, fn, args):
+        self.fn = fn
+        self.args = args
+        self.finished = threading.Event()
+        # (hedged, result, error) of the copy that decided the race
+        self.outcome = None
+        self._running = 0
+        self._lock = threading.Lock()
+
+    def start(self, pool, hedged=False):
+        """ send a copy on the pool, unless the race is already over """
+        with self._lock:
+            if self.finished.is_set():
+                return False
+            self._running += 1
+        pool.apply_async(self._run, (hedged,))
+        return True
+
+    def _run(self, hedged):
+        try:
+            outcome = (hedged, self.fn(*self.args), None)
+        except Exception as e:
+            outcome = (hedged, None, e)
+
+        with self._lock:
+            self._running -= 1
+            if self.finished.is_set():
+                return
+            # a failure only decides it if no other copy is left to succeed
+            if outcome[2] is None or self._running == 0:
+                self.outcome = outcome
+                self.finished.set()
+
+
+class _Timer(object):
+    """Calls functions after a delay, all from one thread rather than a
+    thread per call.
+    """
+
+    def __init__(self):
+        self._queue = []
+        self._seq = itertools.count()
+        self._cond = threading.Condition()
+        self._thread = None
+
+    def call_later(self, delay, fn, *args):
+        with self._cond:
+            heapq.heappush(self._queue,
+                           (time.time() + delay, next(self._seq), fn, args))
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._loop)
+                self._thread.daemon = True
+                self._thread.start()
+            self._cond.notify()
+
+    def _loop(self):
+        while True:
+            with self._cond:
+                while True:
+                    if not self._queue:
+                        self._cond.wait()
+                        continue
+                    wait = self._queue[0][0] - time.time()
+                    if wait <= 0:
+                        break
+                    self._cond.wait(wait)
+                _, _, fn, args = heapq.heappop(self._queue)
+            try:
+                fn(*args)
+            except Exception:
+                pass  # keep the timer going for everyone else
+
+
+class Resilience(object):
+    """Retries, hedging & circuit breaking for requests to the API, see
+    PTVClient's resilience argument.
+
+    Arguments:
+        attempts: max times to send a request that fails with a retryable
+            error
+        backoff: seconds to wait before the first retry, doubling for each
+            one after that. The actual wait is random, up to that long
+            (full jitter), so retries from many threads don't line up
+        max_backoff: most seconds to wait between retries
+        hedge: send a second copy of a request that hasn't finished after
+            hedge_after seconds, and use whichever answers first
+        hedge_after: (optional) seconds before hedging, defaults to the 95th
+            percentile latency of the end point family once enough requests
+            have been seen
+        failure_threshold: failures in a row that open an end point family's
+            circuit
+        reset_timeout: seconds a circuit stays open before a trial request
+        serve_stale: answer from expired cache entries when a request fails
+            or its circuit is open
+        hedge_workers: threads that hedged requests (both copies) are sent
+            on, enough for the requests sent at once and their hedges
+    """
+
+    def __init__(self, attempts=3, backoff=0.1, max_backoff=2.0, hedge=False,
+                 hedge_after=None, failure_threshold=5, reset_timeout=30,
+                 serve_stale=True, latency_window=200, min_samples=20,
+                 hedge_workers=64):
+        self.attempts = attempts
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.hedge = hedge
+        self.hedge_after = hedge_after
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.serve_stale = serve_stale
+        self.latency_window = latency_window
+        self.min_samples = min_samples
+        self.hedge_workers = hedge_workers
+
+        self._breakers = {}
+        self._latencies = {}
+        self._lock = threading.Lock()
+        self._random = random.Random()
+        # created when the first request is hedged
+        self._hedge_pool = None
+        self._timer = None
+
+        self.retries = 0
+        self.hedges = 0
+        self.hedge_wins = 0
+        self.short_circuits = 0
+        self.stale_served = 0
+
+    def family(self, endpoint):
+        return ENDPOINT_FAMILIES.get(endpoint, endpoint)
+
+    def breaker(self, family):
+        with self._lock:
+            breaker = self._breakers.get(family)
+            if breaker is None:
+                breaker = self._breakers[family] = CircuitBreaker(
+                    family, self.failure_threshold, self.reset_timeout)
+            return breaker
+
+    def backoff_for(self, retry):
+        """ seconds to wait before the retry-th retry, counting from 0 """
+        cap = min(self.max_backoff, self.backoff * 2 ** retry)
+        return self._random.uniform(0, cap)
+
+    def _record_latency(self, family, seconds):
+        with self._lock:
+            latencies = self._latencies.get(family)
+            if latencies is None:
+                latencies = self._latencies[family] = deque(
+                    maxlen=self.latency_window)
+            latencies.append(seconds)
+
+    def latency_percentile(self, family, percentile=95):
+        """Latency of recent successful requests in an end point family, or
+        None if there haven't been min_samples of them yet.
+        """
+
+        with self._lock:
+            latencies = sorted(self._latencies.get(family, ()))
+        if len(latencies) < self.min_samples:
+            return None
+        idx = int(round(percentile / 100.0 * (len(latencies) - 1)))
+        return latencies[idx]
+
+    def _hedge_delay(self, family):
+        if not self.hedge:
+            return None
+        if self.hedge_after is not None:
+            return self.hedge_after
+        return self.latency_percentile(family)
+
+    def _hedging(self):
+        """ the pool & timer for hedged requests """
+        with self._lock:
+            if self._hedge_pool is None:
+                self._hedge_pool = ThreadPool(self.hedge_workers)
+                self._timer = _Timer()
+            return self._hedge_pool, self._timer
+
+    def _hedge(self, race, pool):
+        if race.start(pool, hedged=True):
+            with self._lock:
+                self.hedges += 1
+
+    def _hedged(self, delay, fn, args):
+        """Call fn(*args), and call it again if it hasn't returned after
+        delay seconds. The first to succeed wins, the loser finishes in the
+        background.
+        """
+
+        pool, timer = self._hedging()
+        race = _Race(fn, args)
+        race.start(pool)
+        timer.call_later(delay, self._hedge, race, pool)
+        race.finished.wait()
+
+        hedged, result, error = race.outcome
+        if error is not None:
+            raise error
+        if hedged:
+            with self._lock:
+                self.hedge_wins += 1
+        return result
+
+    def call(self, endpoint, fn, *args):
+        """Call fn(*args) to send a request for an end point, retrying,
+        hedging & circuit breaking as configured.
+        """
+
+        family = self.family(endpoint)
+        breaker = self.breaker(family)
+        try:
+            trial = breaker.before_call()
+        except CircuitOpenError:
+            with self._lock:
+                self.short_circuits += 1
+            raise
+
+        # whether the breaker has been told how the call went
+        settled = False
+        try:
+            retry = 0
+            while True:
+                start = time.time()
+                try:
+                    delay = self._hedge_delay(family)
+                    if delay is None:
+                        result = fn(*args)
+                    else:
+                        result = self._hedged(delay, fn, args)
+                except Exception as e:
+                    if not is_retryable(e):
+                        # our own fault, not the API's, so it says nothing
+                        # about the circuit
+                        raise
+                    if retry + 1 >= self.attempts:
+                        breaker.failed()
+                        settled = True
+                        raise
+                    with self._lock:
+                        self.retries += 1
+                    time.sleep(self.backoff_for(retry))
+                    retry += 1
+                    continue
+
+                self._record_latency(family, time.time() - start)
+                breaker.succeeded()
+                settled = True
+                return result
+        finally:
+            if trial and not settled:
+                breaker.release()
+
+    def served_stale(self):
+        with self._lock:
+            self.stale_served += 1
+
+    def stats(self):
+        """Counts of retries, hedged requests (and how many of those beat
+        the original), calls refused by an open circuit and stale responses
+        served, with the state of each end point family's circuit.
+        """
+
+        with self._lock:
+            breakers = list(self._breakers.values())
+            out = {"retries": self.retries,
+                   "hedges": self.hedges,
+                   "hedge_wins": self.hedge_wins,
+                   "short_circuits": self.short_circuits,
+                   "stale_served": self.stale_served,
+                   }
+        out["circuits"] = dict((b.family, b.state) for b in breakers)
+        return out
@@ -6,6 +6,9 @@ class Run(object):
     A specific run on a particular line that may skip certan stops
     """
 
+    __slots__ = ('destination_id', 'destination_name', 'num_skipped', 'run_id',
+                 '_client')
+
     @property
     def transport_type(self):
         raise NotImplementedError
@@ -33,24 +36,34 @@ class Run(object):
                                              stop=stop_id,
                                              for_utc=for_utc)
 
+    def stopping_pattern_async(self, stop, for_utc=None):
+        """ stopping_pattern, on an AsyncPTVClient's pool """
+        return self._client.run_async(self.stopping_pattern, stop,
+                                      for_utc=for_utc)
+
 
 class TramRun(Run):
+    __slots__ = ()
     transport_type = "tram"
 
 
 class TrainRun(Run):
+    __slots__ = ()
     transport_type = "train"
 
 
 class BusRun(Run):
+    __slots__ = ()
     transport_type = "bus"
 
 
 class VlineRun(Run):
+    __slots__ = ()
     transport_type = "vline"
 
 
 class NightriderRun(Run):
+    __slots__ = ()
     transport_type = "nightrider"
 
 
@@ -0,0 +1,223 @@
+from bisect import bisect_left
+import re
+import time
+
+
+TOKEN = re.compile(r"[a-z0-9]+")
+
+# how much a match in each field counts towards a result's score
+FIELD_WEIGHTS = {"location_name": 1.0,
+                 "suburb": 0.5,
+                 "line_name": 1.0,
+                 "line_number": 1.5,
+                 }
+
+EXACT = 3.0
+PREFIX = 2.0
+FUZZY = 1.0
+
+
+def tokenize(text):
+    if not text:
+        return []
+    return TOKEN.findall(text.lower())
+
+
+def edit_distance(a, b, limit, prefix=False):
+    """Optimal string alignment distance between a and b (adjacent
+    transpositions count as one edit), or limit + 1 if it's over limit.
+
+    With prefix, the distance from a to the closest prefix of b, so that a
+    half typed word can be matched against a whole one.
+    """
+
+    over = limit + 1
+    if prefix:
+        b = b[:len(a) + limit]
+    elif abs(len(a) - len(b)) > limit:
+        return over
+
+    previous2 = None
+    previous = list(range(len(b) + 1))
+    for i in range(1, len(a) + 1):
+        char = a[i - 1]
+        current = [i] + [over] * len(b)
+        # cells more than limit off the diagonal are always over the limit
+        for j in range(max(1, i - limit), min(len(b), i + limit) + 1):
+            distance = min(previous[j] + 1,
+                           current[j - 1] + 1,
+                           previous[j - 1] + (char != b[j - 1]))
+            if i > 1 and j > 1 and char == b[j - 2] and a[i - 2] == b[j - 1]:
+                distance = min(distance, previous2[j - 2] + 1)
+            current[j] = distance
+        if min(current) > limit:
+            return over
+        previous2, previous = previous, current
+
+    if prefix:
+        return min(min(previous), over)
+    return min(previous[-1], over)
+
+
+def fuzziness(token):
+    """ edits allowed when fuzzy matching a query token of this length """
+    if len(token) < 4:
+        return 0
+    if len(token) < 8:
+        return 1
+    return 2
+
+
+class SearchIndex(object):
+    """Ranked prefix & fuzzy search over stop and line names, to answer
+    searches without a round trip to /v2/search.
+
+    Stops are indexed on their location_name and suburb, lines on their
+    line_name and line_number. Every word of a search must match a word of
+    a result, either exactly, as a prefix (for autocomplete) or, for longer
+    words that don't otherwise match, within an edit or two after the first
+    two letters (for typos).
+
+    Arguments:
+        stops: Stop objects to index
+        lines: Line objects to index
+        max_age: seconds until the index is considered stale
+    """
+
+    def __init__(self, stops=(), lines=(), max_age=24 * 60 * 60):
+        self.max_age = max_age
+        self.built_at = time.time()
+
+        self._items = []
+        self._seen = set()
+        self._postings = {}
+        self._tokens = []
+
+        for stop in stops:
+            self._add(('stop', stop.transport_type, stop.stop_id), stop,
+                      [("location_name", stop.location_name),
+                       ("suburb", stop.subrub)])
+        for line in lines:
+            self._add(('line', line.transport_type, line.line_id), line,
+                      [("line_name", line.line_name),
+                       ("line_number", line.line_number)])
+
+        self._tokens = sorted(self._postings)
+
+    @classmethod
+    def build(cls, client, modes=None, **kwargs):
+        """Index every line, and every stop on those lines, of the given
+        transport modes.
+        """
+
+        lines = []
+        stops = []
+        for line, line_stops in client.network(modes):
+            lines.append(line)
+            stops.extend(line_stops)
+
+        return cls(stops=stops, lines=lines, **kwargs)
+
+    def _add(self, key, item, fields):
+        if key in self._seen:
+            return
+        self._seen.add(key)
+
+        idx = len(self._items)
+        self._items.append(item)
+        for field, text in fields:
+            weight = FIELD_WEIGHTS[field]
+            for token in tokenize(text):
+                self._postings.setdefault(token, {})
+                postings = self._postings[token]
+                postings[idx] = max(postings.get(idx, 0), weight)
+
+    def __len__(self):
+        return len(self._items)
+
+    def age(self):
+        """ seconds since the index was built """
+        return time.time() - self.built_at
+
+    def is_stale(self):
+        return self.age() > self.max_age
+
+    def _prefixed(self, prefix):
+        """ indexed words starting with prefix """
+        tokens = self._tokens
+        i = bisect_left(tokens, prefix)
+        while i < len(tokens) and tokens[i].startswith(prefix):
+            yield tokens[i]
+            i += 1
+
+    def _matches(self, query, fuzzy):
+        """ {item index: score} for items with a word matching query """
+
+        scores = {}
+
+        def add(token, kind):
+            for idx, weight in self._postings[token].items():
+                score = kind * weight
+                if score > scores.get(idx, 0):
+                    scores[idx] = score
+
+        # exact & prefix matches are a contiguous run of the sorted tokens
+        for token in self._prefixed(query):
+            add(token, EXACT if token == query else PREFIX)
+
+        # only fall back to fuzzy matching for words that match nothing as
+        # typed, and assume the first two letters are right so that only a
+        # few words need comparing
+        limit = fuzziness(query)
+        if fuzzy and limit and not scores:
+            for token in self._prefixed(query[:2]):
+                if edit_distance(query, token, limit, prefix=True) <= limit:
+                    add(token, FUZZY)
+
+        return scores
+
+    def search(self, term, limit=None, fuzzy=True, kind=None):
+        """Stops & lines matching a search term, best match first.
+
+        Arguments:
+            term: search term
+            limit: (optional) max results to return
+            fuzzy: (optional) also match words with small typos
+            kind: (optional) only return 'stop' or 'line' results
+        Returns:
+            list of Stops & Lines
+        """
+
+        queries = tokenize(term)
+        if not queries:
+            return []
+
+        totals = None
+        for query in queries:
+            scores = self._matches(query, fuzzy)
+            if totals is None:
+                totals = scores
+            else:
+                totals = dict((idx, totals[idx] + score)
+                              for idx, score in scores.items()
+                              if idx in totals)
+            if not totals:
+                return []
+
+        def rank(idx):
+            item = self._items[idx]
+            name = getattr(item, 'location_name', None) or \
+                getattr(item, 'line_name', None) or ''
+            return (-totals[idx], len(name), name)
+
+        out = [self._items[idx] for idx in sorted(totals, key=rank)]
+
+        if kind == 'stop':
+            out = [item for item in out if hasattr(item, 'stop_id')]
+        elif kind == 'line':
+            out = [item for item in out if hasattr(item, 'line_id')]
+
+        if limit is not None:
+            out = out[:limit]
+
+        return out
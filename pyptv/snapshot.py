@@ -0,0 +1,342 @@
+import hashlib
+import sqlite3
+import threading
+import time
+
+from pyptv.cache import DAY
+from pyptv.line import LineFactory
+from pyptv.stop import StopFactory
+
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+CREATE TABLE IF NOT EXISTS lines (
+    mode TEXT NOT NULL,
+    line_id INTEGER NOT NULL,
+    seq INTEGER NOT NULL,
+    line_name TEXT,
+    line_number TEXT,
+    stops_hash TEXT,
+    fetched_at REAL,
+    PRIMARY KEY (mode, line_id)
+);
+CREATE TABLE IF NOT EXISTS stops (
+    transport_type TEXT NOT NULL,
+    stop_id INTEGER NOT NULL,
+    location_name TEXT,
+    suburb TEXT,
+    lat REAL,
+    lon REAL,
+    PRIMARY KEY (transport_type, stop_id)
+);
+CREATE TABLE IF NOT EXISTS line_stops (
+    mode TEXT NOT NULL,
+    line_id INTEGER NOT NULL,
+    seq INTEGER NOT NULL,
+    transport_type TEXT NOT NULL,
+    stop_id INTEGER NOT NULL,
+    PRIMARY KEY (mode, line_id, seq)
+);
+CREATE INDEX IF NOT EXISTS line_stops_by_stop
+    ON line_stops (transport_type, stop_id);
+CREATE INDEX IF NOT EXISTS lines_by_seq ON lines (mode, seq);
+"""
+
+
+def _stops_hash(stops):
+    """ fingerprint of a line's stop list, to tell when it has changed """
+
+    digest = hashlib.sha1()
+    for stop in stops:
+        row = (stop.transport_type, stop.stop_id, stop.location_name,
+               stop.subrub, stop.location.lat, stop.location.lon)
+        digest.update(repr(row).encode('utf-8'))
+    return digest.hexdigest()
+
+
+class NetworkSnapshot(object):
+    """Lines, stops and which stops are on which line, saved to an SQLite
+    file so a client can serve lines_by_mode and stops_on_a_line without
+    walking the whole network through the API.
+
+    Arguments:
+        path: SQLite database file, created if it doesn't exist
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._lock = threading.Lock()
+        with self._lock:
+            self._conn.executescript(SCHEMA)
+            self._conn.commit()
+
+    def __repr__(self):
+        return "<NetworkSnapshot: %s>" % self.path
+
+    def close(self):
+        self._conn.close()
+
+    # metadata
+
+    def _get_meta(self, key):
+        row = self._conn.execute("SELECT value FROM meta WHERE key = ?",
+                                 (key,)).fetchone()
+        return row[0] if row is not None else None
+
+    def _set_meta(self, key, value):
+        self._conn.execute("INSERT OR REPLACE INTO meta VALUES (?, ?)",
+                           (key, value))
+
+    @property
+    def refreshed_at(self):
+        """ unix time of the last save or refresh, None if never saved """
+        with self._lock:
+            value = self._get_meta('refreshed_at')
+        return float(value) if value is not None else None
+
+    def age(self):
+        """ seconds since the snapshot was last saved or refreshed """
+        refreshed_at = self.refreshed_at
+        if refreshed_at is None:
+            return None
+        return time.time() - refreshed_at
+
+    def _modes(self):
+        value = self._get_meta('modes')
+        return set(value.split(',')) if value else set()
+
+    def modes(self):
+        """ transport modes that have been saved """
+        with self._lock:
+            return self._modes()
+
+    def has_mode(self, mode):
+        return mode in self.modes()
+
+    # writing
+
+    def _store_line(self, mode, seq, line, stops, now):
+        conn = self._conn
+        conn.execute("INSERT OR REPLACE INTO lines VALUES (?,?,?,?,?,?,?)",
+                     (mode, line.line_id, seq, line.line_name,
+                      line.line_number, _stops_hash(stops), now))
+        conn.execute("DELETE FROM line_stops WHERE mode = ? AND line_id = ?",
+                     (mode, line.line_id))
+        for i, stop in enumerate(stops):
+            conn.execute("INSERT OR REPLACE INTO stops VALUES (?,?,?,?,?,?)",
+                         (stop.transport_type, stop.stop_id,
+                          stop.location_name, stop.subrub,
+                          stop.location.lat, stop.location.lon))
+            conn.execute("INSERT INTO line_stops VALUES (?,?,?,?,?)",
+                         (mode, line.line_id, i,
+                          stop.transport_type, stop.stop_id))
+
+    def _delete_line(self, mode, line_id):
+        self._conn.execute("DELETE FROM lines WHERE mode = ? AND line_id = ?",
+                           (mode, line_id))
+        self._conn.execute("DELETE FROM line_stops "
+                           "WHERE mode = ? AND line_id = ?", (mode, line_id))
+
+    def _delete_orphan_stops(self):
+        self._conn.execute("DELETE FROM stops WHERE NOT EXISTS ("
+                           "SELECT 1 FROM line_stops AS ls "
+                           "WHERE ls.transport_type = stops.transport_type "
+                           "AND ls.stop_id = stops.stop_id)")
+
+    def _mark_refreshed(self, modes, now):
+        modes = self._modes() | set(modes)
+        self._set_meta('modes', ','.join(sorted(modes)))
+        self._set_meta('refreshed_at', repr(now))
+        if self._get_meta('built_at') is None:
+            self._set_meta('built_at', repr(now))
+
+    def save(self, client, modes=None):
+        """Fetch every line and its stops from the API and save them,
+        replacing anything already saved for those modes.
+
+        Arguments:
+            client: a PTVClient
+            modes: (optional) transport modes to save, defaults to all
+        """
+
+        if modes is None:
+            modes = sorted(LineFactory.classes)
+
+        # fetch everything first, so a failure doesn't leave a half
+        # written snapshot behind
+        fetched = {}
+        for mode in modes:
+            fetched[mode] = list(client.network([mode], fresh=True))
+
+        now = time.time()
+        with self._lock:
+            for mode in modes:
+                self._conn.execute("DELETE FROM lines WHERE mode = ?",
+                                   (mode,))
+                self._conn.execute("DELETE FROM line_stops WHERE mode = ?",
+                                   (mode,))
+                for seq, (line, stops) in enumerate(fetched[mode]):
+                    self._store_line(mode, seq, line, stops, now)
+            self._delete_orphan_stops()
+            self._mark_refreshed(modes, now)
+            self._conn.commit()
+
+    def refresh(self, client, modes=None, max_age=DAY):
+        """Bring the snapshot up to date, fetching as little as possible.
+
+        The line list of each mode is fetched (one request per mode). Stops
+        are then only fetched for lines that are new, that were renamed, or
+        that were fetched more than max_age seconds ago (a line's stops can
+        change without the line list showing it). Lines that no longer exist
+        are removed.
+
+        Arguments:
+            client: a PTVClient
+            modes: (optional) transport modes to refresh, defaults to the
+                modes already saved
+            max_age: (optional) re-fetch the stops of lines fetched more than
+                this many seconds ago, defaults to a day. None never
+                re-fetches the stops of an existing line that wasn't renamed
+        Returns:
+            a dictionary of lists of (mode, line_id) tuples:
+            {'added': [...], 'changed': [...], 'removed': [...],
+             'unchanged': [...]}
+            where changed lines are those whose stop list differs
+        """
+
+        if modes is None:
+            modes = sorted(self.modes())
+
+        report = {'added': [], 'changed': [], 'removed': [], 'unchanged': []}
+        now = time.time()
+
+        for mode in modes:
+            lines = client.lines_by_mode(mode, fresh=True)
+
+            with self._lock:
+                rows = self._conn.execute(
+                    "SELECT line_id, line_name, line_number, stops_hash, "
+                    "fetched_at FROM lines WHERE mode = ?", (mode,))
+                known = dict((row[0], row[1:]) for row in rows)
+
+            # fetch outside the lock, it can take a while
+            updates = []
+            for seq, line in enumerate(lines):
+                old = known.pop(line.line_id, None)
+                if old is not None:
+                    line_name, line_number, stops_hash, fetched_at = old
+                    stale = max_age is not None and \
+                        now - fetched_at > max_age
+                    renamed = (line_name, line_number) != \
+                        (line.line_name, line.line_number)
+                    if not (stale or renamed):
+                        updates.append((seq, line, None))
+                        report['unchanged'].append((mode, line.line_id))
+                        continue
+
+                stops = client.stops_on_a_line(mode, line.line_id,
+                                               fresh=True)
+                updates.append((seq, line, stops))
+
+                if old is None:
+                    report['added'].append((mode, line.line_id))
+                elif old[2] != _stops_hash(stops):
+                    report['changed'].append((mode, line.line_id))
+                else:
+                    report['unchanged'].append((mode, line.line_id))
+
+            with self._lock:
+                for seq, line, stops in updates:
+                    if stops is None:
+                        self._conn.execute(
+                            "UPDATE lines SET seq = ? "
+                            "WHERE mode = ? AND line_id = ?",
+                            (seq, mode, line.line_id))
+                    else:
+                        self._store_line(mode, seq, line, stops, now)
+                for line_id in known:
+                    self._delete_line(mode, line_id)
+                    report['removed'].append((mode, line_id))
+                self._conn.commit()
+
+        with self._lock:
+            self._delete_orphan_stops()
+            self._mark_refreshed(modes, now)
+            self._conn.commit()
+
+        return report
+
+    # reading
+
+    def lines_by_mode(self, client, mode, name=None):
+        """Saved lines for a transport mode, optionally only those with name
+        in their line_name.
+        """
+
+        query = "SELECT line_id, line_name, line_number FROM lines " + \
+                "WHERE mode = ?"
+        params = [mode]
+        if name is not None:
+            query += " AND line_name LIKE ?"
+            params.append('%' + name + '%')
+        query += " ORDER BY seq"
+
+        with self._lock:
+            rows = self._conn.execute(query, params).fetchall()
+
+        line_factory = LineFactory(client)
+
+        return [line_factory.create(transport_type=mode, line_id=line_id,
+                                    line_name=line_name,
+                                    line_number=line_number)
+                for line_id, line_name, line_number in rows]
+
+    def stops_on_a_line(self, client, mode, line):
+        """Saved stops for a line, or None if the line isn't saved"""
+
+        with self._lock:
+            known = self._conn.execute(
+                "SELECT 1 FROM lines WHERE mode = ? AND line_id = ?",
+                (mode, line)).fetchone()
+            if known is None:
+                return None
+            rows = self._conn.execute(
+                "SELECT s.transport_type, s.stop_id, s.location_name, "
+                "s.suburb, s.lat, s.lon FROM line_stops AS ls "
+                "JOIN stops AS s ON s.transport_type = ls.transport_type "
+                "AND s.stop_id = ls.stop_id "
+                "WHERE ls.mode = ? AND ls.line_id = ? ORDER BY ls.seq",
+                (mode, line)).fetchall()
+
+        stop_factory = StopFactory(client)
+
+        return [stop_factory.create(transport_type=transport_type,
+                                    stop_id=stop_id,
+                                    location_name=location_name,
+                                    suburb=suburb, lat=lat, lon=lon,
+                                    distance=0)
+                for (transport_type, stop_id, location_name, suburb,
+                     lat, lon) in rows]
+
+    def lines_for_stop(self, client, transport_type, stop_id):
+        """ saved lines that stop at a given stop """
+
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT l.mode, l.line_id, l.line_name, l.line_number "
+                "FROM line_stops AS ls JOIN lines AS l "
+                "ON l.mode = ls.mode AND l.line_id = ls.line_id "
+                "WHERE ls.transport_type = ? AND ls.stop_id = ? "
+                "GROUP BY l.mode, l.line_id ORDER BY l.mode, l.seq",
+                (transport_type, stop_id)).fetchall()
+
+        line_factory = LineFactory(client)
+
+        return [line_factory.create(transport_type=mode, line_id=line_id,
+                                    line_name=line_name,
+                                    line_number=line_number)
+                for mode, line_id, line_name, line_number in rows]
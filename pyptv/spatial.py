@@ -0,0 +1,177 @@
+from math import cos, radians, floor, pi
+import heapq
+import time
+
+from pyptv.location import EARTH_RADIUS, haversine, parse_location
+
+
+KM_PER_DEGREE = EARTH_RADIUS * pi / 180
+
+
+class StopIndex(object):
+    """Grid index over stop locations, for answering nearest stop queries
+    without going back to the API.
+
+    Stops are bucketed into square cells of cell_size degrees. A query
+    searches rings of cells outward from the query point until no unsearched
+    cell could hold anything closer.
+
+    Arguments:
+        stops: Stop objects to index
+        cell_size: size of a grid cell in degrees
+        max_age: seconds until the index is considered stale
+        nearme_limit: number of stops to return when no limit is given,
+            mirroring the /v2/nearme end point
+    """
+
+    def __init__(self, stops, cell_size=0.01, max_age=24 * 60 * 60,
+                 nearme_limit=30):
+        self.cell_size = cell_size
+        self.max_age = max_age
+        self.nearme_limit = nearme_limit
+        self.built_at = time.time()
+
+        self._cells = {}
+        self._stops = {}
+        for stop in stops:
+            key = (stop.transport_type, stop.stop_id)
+            if key in self._stops:
+                continue
+            self._stops[key] = stop
+            cell = self._cell(stop.location.lat, stop.location.lon)
+            self._cells.setdefault(cell, []).append(stop)
+
+        if self._cells:
+            rows = [row for row, col in self._cells]
+            cols = [col for row, col in self._cells]
+            self._bounds = (min(rows), max(rows), min(cols), max(cols))
+        else:
+            self._bounds = None
+
+    @classmethod
+    def build(cls, client, modes=None, **kwargs):
+        """Index every stop on every line of the given transport modes"""
+
+        stops = []
+        for line, line_stops in client.network(modes):
+            stops.extend(line_stops)
+
+        return cls(stops, **kwargs)
+
+    def __len__(self):
+        return len(self._stops)
+
+    def age(self):
+        """ seconds since the index was built """
+        return time.time() - self.built_at
+
+    def is_stale(self):
+        return self.age() > self.max_age
+
+    def _cell(self, lat, lon):
+        return (int(floor(lat / self.cell_size)),
+                int(floor(lon / self.cell_size)))
+
+    def _rings(self, lat, lon):
+        """Yield (min_distance, cells) for rings of cells around a point,
+        where min_distance is a lower bound on the distance to anything
+        outside of the rings yielded before it.
+        """
+
+        if self._bounds is None:
+            return
+
+        row, col = self._cell(lat, lon)
+        min_row, max_row, min_col, max_col = self._bounds
+        last = max(abs(row - min_row), abs(row - max_row),
+                   abs(col - min_col), abs(col - max_col))
+
+        # a degree of longitude shrinks away from the equator, so use the
+        # narrowest cell in the grid, less a little for great circle paths
+        # being shorter than paths along a parallel
+        max_lat = max(abs(min_row), abs(max_row) + 1) * self.cell_size
+        km_per_cell = 0.99 * self.cell_size * KM_PER_DEGREE * \
+            cos(radians(min(max_lat, 89.0)))
+
+        for ring in range(last + 1):
+            if ring == 0:
+                cells = [(row, col)]
+            else:
+                cells = [(row - ring, c)
+                         for c in range(col - ring, col + ring + 1)]
+                cells += [(row + ring, c)
+                          for c in range(col - ring, col + ring + 1)]
+                cells += [(r, col - ring)
+                          for r in range(row - ring + 1, row + ring)]
+                cells += [(r, col + ring)
+                          for r in range(row - ring + 1, row + ring)]
+            # the query point may sit on the edge of its cell, so anything
+            # not in the rings before this one is at least ring - 1 cells away
+            yield max(ring - 1, 0) * km_per_cell, cells
+
+    def _candidates(self, lat, lon, cells, mode):
+        for cell in cells:
+            for stop in self._cells.get(cell, ()):
+                if mode is not None and stop.transport_type != mode:
+                    continue
+                distance = haversine(lat, lon,
+                                     stop.location.lat, stop.location.lon)
+                yield distance, stop
+
+    def nearest(self, location, k=None, mode=None, max_distance=None):
+        """The k stops nearest to a location.
+
+        Arguments:
+            location: one of (lat, lon), a Location object, or something that
+                    has a location property
+            k: (optional) number of stops to return, defaults to nearme_limit
+            mode: (optional) only return stops of this transport mode
+            max_distance: (optional) only return stops within this many km
+        Returns:
+            List of tuples in the form (stop, distance), closest first
+        """
+
+        lat, lon = parse_location(location)
+        if k is None:
+            k = self.nearme_limit
+        if k <= 0:
+            return []
+
+        # max heap (by negated distance) of the k closest stops found so far
+        best = []
+        for bound, cells in self._rings(lat, lon):
+            if len(best) == k and -best[0][0] <= bound:
+                break
+            if max_distance is not None and bound > max_distance:
+                break
+            for distance, stop in self._candidates(lat, lon, cells, mode):
+                if max_distance is not None and distance > max_distance:
+                    continue
+                item = (-distance, id(stop), stop)
+                if len(best) < k:
+                    heapq.heappush(best, item)
+                elif distance < -best[0][0]:
+                    heapq.heapreplace(best, item)
+
+        best.sort(reverse=True)
+        return [(stop, -distance) for distance, _, stop in best]
+
+    def within(self, location, radius, mode=None):
+        """All stops within radius km of a location.
+
+        Returns:
+            List of tuples in the form (stop, distance), closest first
+        """
+
+        lat, lon = parse_location(location)
+
+        out = []
+        for bound, cells in self._rings(lat, lon):
+            if bound > radius:
+                break
+            for distance, stop in self._candidates(lat, lon, cells, mode):
+                if distance <= radius:
+                    out.append((distance, id(stop), stop))
+
+        out.sort()
+        return [(stop, distance) for distance, _, stop in out]
@@ -2,10 +2,14 @@ from pyptv.factory import TypeFactory
 from pyptv.location import Location
 
 from pyptv.location import LocationMixin
+from pyptv.watcher import DepartureWatcher
 
 
 class Stop(LocationMixin):
 
+    __slots__ = ('location', 'location_name', 'stop_id', 'subrub', '_client',
+                 '__weakref__')
+
     @property
     def transport_type(self):
         raise NotImplementedError
@@ -36,29 +40,63 @@ class Stop(LocationMixin):
                                                      limit=limit,
                                                      for_utc=for_utc)
 
+    def broad_next_departures_async(self, limit=5):
+        """ broad_next_departures, on an AsyncPTVClient's pool """
+        return self._client.run_async(self.broad_next_departures, limit=limit)
+
+    def specific_next_departures_async(self, line, direction, limit=5,
+                                       for_utc=None):
+        """ specific_next_departures, on an AsyncPTVClient's pool """
+        return self._client.run_async(self.specific_next_departures, line,
+                                      direction, limit=limit, for_utc=for_utc)
+
+    def watch_departures(self, line=None, direction=None, limit=5,
+                         **kwargs):
+        """Poll this stop's departures and yield DepartureEvents as they
+        change. Watches every line unless both line & direction are given.
+        Other arguments are passed on to DepartureWatcher.
+        """
+
+        if line is not None and direction is not None:
+            def fetch():
+                return self.specific_next_departures(line, direction,
+                                                     limit=limit)
+        else:
+            def fetch():
+                return self.broad_next_departures(limit=limit)
+
+        return iter(DepartureWatcher(fetch, **kwargs))
+
 
 class TramStop(Stop):
+    __slots__ = ()
     transport_type = "tram"
 
 
 class TrainStop(Stop):
+    __slots__ = ()
     transport_type = "train"
 
 
 class BusStop(Stop):
+    __slots__ = ()
     transport_type = "bus"
 
 
 class VlineStop(Stop):
+    __slots__ = ()
     transport_type = "vline"
 
 
 class NightriderStop(Stop):
+    __slots__ = ()
     transport_type = "nightrider"
 
 
 class StopFactory(TypeFactory):
 
+    identity = 'stop_id'
+
     classes = {'train': TrainStop,
                'tram': TramStop,
                'bus': BusStop,
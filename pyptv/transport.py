@@ -0,0 +1,104 @@
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from pyptv.exceptions import APIError
+
+
+class HTTPTransport(object):
+    """Pooled, keep-alive HTTP transport used by PTVClient to talk to the API.
+
+    Arguments:
+        pool_size: max number of connections kept open to the API host
+        timeout: seconds to wait for the server, either a single number or a
+            tuple of (connect timeout, read timeout)
+        max_in_flight: (optional) max number of concurrent requests, callers
+            beyond this block until a slot frees up. Defaults to pool_size
+    """
+
+    def __init__(self, pool_size=10, timeout=(3.05, 10), max_in_flight=None):
+        self.pool_size = pool_size
+        self.timeout = timeout
+        self.max_in_flight = max_in_flight or pool_size
+
+        self.session = requests.Session()
+        self.session.headers['Connection'] = 'keep-alive'
+        # block on an exhausted pool rather than opening throwaway connections
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size,
+                              pool_block=True)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        self._adapter = adapter
+
+        self._slots = threading.BoundedSemaphore(self.max_in_flight)
+        self._lock = threading.Lock()
+        self._requests = 0
+        self._in_flight = 0
+        self._peak_in_flight = 0
+        self._wait_time = 0.0
+
+    def get(self, url, timeout=None):
+        """GET a url and return the raw body of the response, raising
+        APIError for an error status.
+        """
+
+        start = time.time()
+        self._slots.acquire()
+        waited = time.time() - start
+
+        with self._lock:
+            self._requests += 1
+            self._in_flight += 1
+            self._peak_in_flight = max(self._peak_in_flight, self._in_flight)
+            self._wait_time += waited
+
+        try:
+            if timeout is None:
+                timeout = self.timeout
+            response = self.session.get(url, timeout=timeout)
+            if response.status_code >= 400:
+                raise APIError("API returned HTTP %d" % response.status_code,
+                               status=response.status_code,
+                               body=response.content[:1024])
+            return response.content
+        finally:
+            with self._lock:
+                self._in_flight -= 1
+            self._slots.release()
+
+    def stats(self):
+        """Connection pool statistics, useful for sizing the pool.
+
+        Returns:
+            a dictionary with:
+                requests: total requests sent
+                new_connections: connections that had to be opened
+                hits: requests that reused a pooled keep-alive connection
+                in_flight: requests currently being sent
+                peak_in_flight: most requests that were in flight at once
+                wait_time: total seconds callers spent waiting for a slot
+        """
+
+        new_connections = 0
+        pool_requests = 0
+        pools = self._adapter.poolmanager.pools
+        for key in pools.keys():
+            pool = pools[key]
+            if pool is None:
+                continue
+            new_connections += pool.num_connections
+            pool_requests += pool.num_requests
+
+        with self._lock:
+            return {"requests": self._requests,
+                    "new_connections": new_connections,
+                    "hits": max(pool_requests - new_connections, 0),
+                    "in_flight": self._in_flight,
+                    "peak_in_flight": self._peak_in_flight,
+                    "wait_time": self._wait_time,
+                    }
+
+    def close(self):
+        self.session.close()
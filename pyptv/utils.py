@@ -1,18 +1,97 @@
-from datetime import datetime
+from bisect import bisect_right
+import calendar
+from datetime import datetime, timedelta
+# the first strptime call lazily imports _strptime, which isn't thread safe
+import _strptime  # noqa
 
 import pytz
 
 AU_MEL = pytz.timezone('Australia/Melbourne')
 UTC = pytz.timezone('UTC')
 
+TIMESTAMP_FORMAT = "%Y-%m-%dT%H:%M:%SZ"
+
+ONE_HOUR = timedelta(hours=1)
+
+# (utc offset, tzinfo) of AU_MEL for each UTC hour seen, keyed on the
+# 'YYYY-MM-DDTHH' prefix of a timestamp
+_offsets = {}
+_MAX_OFFSETS = 4096
+
+
+def parse_utc(raw):
+    """ naive UTC datetime for an API timestamp, e.g. '2015-01-11T16:41:11Z' """
+
+    # slicing out the fields is much quicker than strptime, which is only
+    # used for anything not in the exact format
+    if len(raw) == 20 and raw[4] == '-' and raw[7] == '-' and \
+            raw[10] == 'T' and raw[13] == ':' and raw[16] == ':' and \
+            raw[19] == 'Z':
+        digits = raw[0:4] + raw[5:7] + raw[8:10] + \
+            raw[11:13] + raw[14:16] + raw[17:19]
+        if digits.isdigit():
+            try:
+                return datetime(int(raw[0:4]), int(raw[5:7]),
+                                int(raw[8:10]), int(raw[11:13]),
+                                int(raw[14:16]), int(raw[17:19]))
+            except ValueError:
+                pass
+
+    return datetime.strptime(raw, TIMESTAMP_FORMAT)
+
+
+def _transition(tz, dt):
+    """ the (utcoffset, tzinfo) that tz uses at the naive UTC time dt """
+    idx = max(0, bisect_right(tz._utc_transition_times, dt) - 1)
+    inf = tz._transition_info[idx]
+    return inf[0], tz._tzinfos[inf]
+
+
+def _melbourne_offset(raw, dt):
+    """ memoized (utcoffset, tzinfo) of AU_MEL for a UTC timestamp """
+
+    hour = raw[:13]
+    cached = _offsets.get(hour)
+    if cached is not None:
+        return cached
+
+    offset = _transition(AU_MEL, dt)
+
+    # only remember hours that don't have a transition part way through
+    start = dt.replace(minute=0, second=0)
+    end = start + ONE_HOUR - timedelta(microseconds=1)
+    if _transition(AU_MEL, start) == offset == _transition(AU_MEL, end):
+        if len(_offsets) >= _MAX_OFFSETS:
+            _offsets.clear()
+        _offsets[hour] = offset
+
+    return offset
+
 
 def parse_datetime_tz(raw):
+    """ Melbourne time for an API UTC timestamp, e.g. '2015-01-11T16:41:11Z' """
+
+    dt = parse_utc(raw)
+
+    if not hasattr(AU_MEL, '_utc_transition_times'):
+        return UTC.localize(dt).astimezone(AU_MEL)
+
+    # the same as UTC.localize(dt).astimezone(AU_MEL) which pytz works
+    # out by searching AU_MEL's transitions each time
+    offset, tzinfo = _melbourne_offset(raw, dt)
+    return (dt + offset).replace(tzinfo=tzinfo)
+
+
+def parse_datetimes_tz(raws):
+    """parse_datetime_tz for a list of timestamps, passing None through
+    (e.g. for missing realtime departures).
+    """
 
-    # '2015-01-11T16:41:11Z'
-    dt = datetime.strptime(raw, "%Y-%m-%dT%H:%M:%SZ")
+    return [parse_datetime_tz(raw) if raw is not None else None
+            for raw in raws]
 
-    dt_utc = UTC.localize(dt)
 
-    dt_tz = dt_utc.astimezone(AU_MEL)
+def parse_epoch(raw):
+    """ seconds since the epoch for an API UTC timestamp """
 
-    return dt_tz
+    return calendar.timegm(parse_utc(raw).timetuple())
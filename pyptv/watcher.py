@@ -0,0 +1,118 @@
+from collections import namedtuple
+from datetime import datetime
+import time
+
+from pyptv.utils import UTC
+
+
+NEW = "new"
+REALTIME_CHANGED = "realtime_changed"
+FLAGS_CHANGED = "flags_changed"
+DEPARTED = "departed"
+
+
+class DepartureEvent(namedtuple("DepartureEvent",
+                                ["kind", "run_id", "departure", "previous"])):
+    """A change to a departure between two polls.
+
+    kind: one of NEW, REALTIME_CHANGED, FLAGS_CHANGED or DEPARTED
+    run_id: run_id of the departure's Run
+    departure: the departure as it is now (None when DEPARTED)
+    previous: the departure as it was last poll (None when NEW)
+    """
+    __slots__ = ()
+
+
+def departure_time(departure):
+    """ realtime departure time if there is one, else the timetabled one """
+    realtime = departure["time_realtime_utc"]
+    if realtime is not None:
+        return realtime
+    return departure["time_timetable_utc"]
+
+
+class DepartureWatcher(object):
+    """Polls for departures and yields only what changed.
+
+    Departures are matched between polls by run_id. Polling speeds up as the
+    next departure gets close and slows down when there's nothing coming
+    (e.g. overnight).
+
+    Arguments:
+        fetch: callable returning a list of departures, e.g.
+            lambda: stop.broad_next_departures(limit=5)
+        min_interval: shortest time between polls, in seconds
+        max_interval: longest time between polls, in seconds
+        urgency: poll this many times in the time left until the next
+            departure, within the bounds above
+        sleep: function used to wait between polls
+    """
+
+    def __init__(self, fetch, min_interval=5, max_interval=300, urgency=4,
+                 sleep=time.sleep):
+        self.fetch = fetch
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.urgency = urgency
+        self.sleep = sleep
+
+        self.departures = {}
+        self.polls = 0
+
+    def diff(self, departures):
+        """Compare departures against those from the last poll, remember
+        them, and return a list of DepartureEvents.
+        """
+
+        current = {}
+        events = []
+        for departure in departures:
+            run_id = departure["run"].run_id
+            current[run_id] = departure
+
+            previous = self.departures.get(run_id)
+            if previous is None:
+                events.append(DepartureEvent(NEW, run_id, departure, None))
+                continue
+            if previous["time_realtime_utc"] != \
+                    departure["time_realtime_utc"]:
+                events.append(DepartureEvent(REALTIME_CHANGED, run_id,
+                                             departure, previous))
+            if previous["flags"] != departure["flags"]:
+                events.append(DepartureEvent(FLAGS_CHANGED, run_id,
+                                             departure, previous))
+
+        for run_id, previous in self.departures.items():
+            if run_id not in current:
+                events.append(DepartureEvent(DEPARTED, run_id,
+                                             None, previous))
+
+        self.departures = current
+        return events
+
+    def poll(self):
+        """ fetch departures once and return what changed """
+        self.polls += 1
+        return self.diff(self.fetch())
+
+    def next_interval(self, now=None):
+        """ seconds to wait before the next poll """
+
+        if not self.departures:
+            return self.max_interval
+
+        if now is None:
+            now = datetime.now(UTC)
+
+        soonest = min(departure_time(departure)
+                      for departure in self.departures.values())
+        remaining = (soonest - now).total_seconds()
+
+        interval = remaining / float(self.urgency)
+        return max(self.min_interval, min(self.max_interval, interval))
+
+    def __iter__(self):
+        while True:
+            for event in self.poll():
+                yield event
+            self.sleep(self.next_interval())
@@ -0,0 +1,50 @@
+"""API responses for the tests, in the same shape as the real ones, and a
+client that replays them.
+"""
+import json
+
+from pyptv.client import PTVClient
+from pyptv.replay import ReplayTransport
+
+
+def stop(stop_id, lat, lon, mode="tram"):
+    return {"transport_type": mode,
+            "stop_id": stop_id,
+            "location_name": "Stop %d" % stop_id,
+            "suburb": "Brunswick",
+            "lat": lat,
+            "lon": lon,
+            "distance": 0.0,
+            }
+
+
+def departure(stop, run_id, timetable, realtime=None, mode="tram"):
+    return {"platform": {"realtime_id": 0,
+                         "stop": stop,
+                         "direction": {"linedir_id": 23,
+                                       "direction_id": 5,
+                                       "direction_name": "City",
+                                       "line": {"transport_type": mode,
+                                                "line_id": 19,
+                                                "line_name": "19 - City",
+                                                "line_number": "19"}}},
+            "run": {"transport_type": mode,
+                    "run_id": run_id,
+                    "num_skipped": 0,
+                    "destination_id": 1,
+                    "destination_name": "Flinders St"},
+            "time_timetable_utc": timetable,
+            "time_realtime_utc": realtime,
+            "flags": "E",
+            }
+
+
+def replay_client(responses, **kwargs):
+    """A PTVClient answering from {request key: response}, with the
+    responses as JSON-able objects. Its transport is client.transport.
+    """
+
+    fixtures = dict((key, json.dumps(response))
+                    for key, response in responses.items())
+    return PTVClient("1000", "key", transport=ReplayTransport(fixtures),
+                     **kwargs)
@@ -0,0 +1,95 @@
+import unittest
+
+from pyptv import cache
+from pyptv.cache import ResponseCache
+from pyptv.client import BROAD_DEPARTURES_PATH
+
+from tests.fixtures import departure, replay_client, stop
+
+
+class Clock(object):
+    """ stands in for the time module, so entries can be aged """
+
+    def __init__(self, now=1000.0):
+        self.now = now
+
+    def time(self):
+        return self.now
+
+
+class ResponseCacheTest(unittest.TestCase):
+
+    def setUp(self):
+        self.clock = Clock()
+        self._time = cache.time
+        cache.time = self.clock
+
+    def tearDown(self):
+        cache.time = self._time
+
+    def test_fresh_until_ttl(self):
+        c = ResponseCache(ttls={"thing": 10})
+        c.set("thing", "/a", "body")
+
+        self.clock.now += 10
+        self.assertEqual(c.get("/a"), "body")
+        self.clock.now += 1
+        self.assertEqual(c.get("/a"), None)
+        self.assertEqual((c.hits, c.misses, c.expirations), (1, 1, 1))
+
+    def test_ttl_zero_isnt_cached(self):
+        c = ResponseCache(ttls={"thing": 0})
+        c.set("thing", "/a", "body")
+        self.assertEqual(len(c), 0)
+        self.assertEqual(c.get("/a"), None)
+
+    def test_stale(self):
+        c = ResponseCache(ttls={"thing": 10}, stale_for=60)
+        c.set("thing", "/a", "body")
+
+        self.clock.now += 30
+        self.assertEqual(c.get("/a"), None)
+        self.assertEqual(c.get_stale("/a"), "body")
+        self.clock.now += 41
+        self.assertEqual(c.get_stale("/a"), None)
+
+    def test_evicts_least_recently_used(self):
+        # room for three entries of 2 + 8 bytes
+        c = ResponseCache(max_bytes=30, ttls={"thing": 60})
+        for key in ("/a", "/b", "/c"):
+            c.set("thing", key, "x" * 8)
+        c.get("/a")
+        c.set("thing", "/d", "x" * 8)
+
+        self.assertEqual(c.get("/b"), None)
+        for key in ("/a", "/c", "/d"):
+            self.assertEqual(c.get(key), "x" * 8)
+        self.assertEqual(c.evictions, 1)
+        self.assertEqual(c.stats()["bytes"], 30)
+
+    def test_replacing_keeps_size(self):
+        c = ResponseCache(max_bytes=30, ttls={"thing": 60})
+        c.set("thing", "/a", "x" * 8)
+        c.set("thing", "/a", "y" * 4)
+        self.assertEqual(c.stats()["bytes"], 6)
+        self.assertEqual(c.get("/a"), "yyyy")
+
+    def test_client_answers_from_cache(self):
+        path = BROAD_DEPARTURES_PATH.render(1, 2809, 5)
+        s = stop(2809, -37.77, 144.96)
+        client = replay_client(
+            {path: {"values": [departure(s, 1, "2015-06-04T05:00:00Z")]}},
+            cache=ResponseCache())
+
+        for _ in range(3):
+            departures = client.broad_next_departures("tram", 2809)
+            self.assertEqual(departures[0]["run"].run_id, 1)
+        self.assertEqual(client.transport.requests, 1)
+
+        self.clock.now += cache.DEFAULT_TTLS["broad_next_departures"] + 1
+        client.broad_next_departures("tram", 2809)
+        self.assertEqual(client.transport.requests, 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
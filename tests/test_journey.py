@@ -0,0 +1,101 @@
+from datetime import datetime
+import unittest
+
+import pytz
+
+from pyptv.client import STOPPING_PATTERN_PATH
+from pyptv.journey import TransitGraph
+
+from tests.fixtures import departure, replay_client, stop
+
+
+def utc(hour, minute):
+    return datetime(2015, 6, 4, hour, minute, tzinfo=pytz.utc)
+
+
+STOPS = dict((i, stop(i, -37.77 + i * 0.01, 144.96)) for i in range(1, 6))
+
+
+class TransitGraphTest(unittest.TestCase):
+
+    def setUp(self):
+        responses = {
+            # run 7 goes 1, 2, 3, running four minutes late at 1, which is
+            # after its timetabled time at 3. The API doesn't list stops in
+            # order
+            STOPPING_PATTERN_PATH.render(1, 7, 1): {"values": [
+                departure(STOPS[3], 7, "2015-06-04T05:04:00Z"),
+                departure(STOPS[1], 7, "2015-06-04T05:00:00Z",
+                          "2015-06-04T05:04:00Z"),
+                departure(STOPS[2], 7, "2015-06-04T05:02:00Z"),
+            ]},
+            # run 8 goes 3, 4, 5
+            STOPPING_PATTERN_PATH.render(1, 8, 3): {"values": [
+                departure(STOPS[3], 8, "2015-06-04T05:10:00Z"),
+                departure(STOPS[4], 8, "2015-06-04T05:15:00Z"),
+                departure(STOPS[5], 8, "2015-06-04T05:20:00Z"),
+            ]},
+        }
+        client = replay_client(responses)
+
+        self.graph = TransitGraph(min_transfer=120)
+        self.graph.add_stopping_pattern(
+            client.stopping_pattern("tram", 7, 1))
+        self.graph.add_stopping_pattern(
+            client.stopping_pattern("tram", 8, 3))
+
+    def stop(self, stop_id):
+        return self.graph.stops[("tram", stop_id)]
+
+    def test_connections_in_stopping_order(self):
+        run_7 = [c for c in self.graph._connections if c.run.run_id == 7]
+        self.assertEqual([(c.departure_stop[1], c.arrival_stop[1])
+                          for c in run_7], [(1, 2), (2, 3)])
+        for connection in self.graph._connections:
+            self.assertTrue(connection.departs <= connection.arrives)
+
+    def test_lateness_carries_forward(self):
+        run_7 = [c for c in self.graph._connections if c.run.run_id == 7]
+        self.assertEqual(run_7[0].departure_time, utc(5, 4))
+        self.assertEqual(run_7[1].arrival_time, utc(5, 4))
+
+    def test_no_journey_backwards(self):
+        self.assertEqual(
+            self.graph.earliest_arrival(self.stop(2), self.stop(1),
+                                        utc(4, 0)), None)
+
+    def test_one_run(self):
+        legs = self.graph.earliest_arrival(self.stop(1), self.stop(3),
+                                           utc(4, 0))
+        self.assertEqual([(leg.run.run_id, leg.board.stop_id,
+                           leg.alight.stop_id) for leg in legs],
+                         [(7, 1, 3)])
+        self.assertEqual(legs[0].departure_time, utc(5, 4))
+
+    def test_missed_run(self):
+        self.assertEqual(
+            self.graph.earliest_arrival(self.stop(1), self.stop(3),
+                                        utc(5, 5)), None)
+
+    def test_transfer(self):
+        legs = self.graph.earliest_arrival(self.stop(1), self.stop(5),
+                                           utc(4, 0))
+        self.assertEqual([(leg.run.run_id, leg.board.stop_id,
+                           leg.alight.stop_id) for leg in legs],
+                         [(7, 1, 3), (8, 3, 5)])
+        self.assertEqual(legs[-1].arrival_time, utc(5, 20))
+
+    def test_transfer_too_tight(self):
+        self.graph.min_transfer = 10 * 60
+        self.assertEqual(
+            self.graph.earliest_arrival(self.stop(1), self.stop(5),
+                                        utc(4, 0)), None)
+
+    def test_already_there(self):
+        self.assertEqual(
+            self.graph.earliest_arrival(self.stop(1), self.stop(1),
+                                        utc(4, 0)), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
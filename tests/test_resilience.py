@@ -0,0 +1,190 @@
+import unittest
+
+from pyptv import cache, resilience
+from pyptv.cache import ResponseCache
+from pyptv.exceptions import APIError, CircuitOpenError
+from pyptv.resilience import (CLOSED, HALF_OPEN, OPEN, CircuitBreaker,
+                              Resilience)
+
+from tests.fixtures import replay_client
+
+
+class Clock(object):
+    """ stands in for the time module, sleeping moves it on """
+
+    def __init__(self, now=1000.0):
+        self.now = now
+
+    def time(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.now += seconds
+
+
+def fails(error):
+    def fn():
+        raise error
+    return fn
+
+
+def ok():
+    return "ok"
+
+
+class ClockTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.clock = Clock()
+        self._time = resilience.time
+        resilience.time = cache.time = self.clock
+
+    def tearDown(self):
+        resilience.time = cache.time = self._time
+
+
+class CircuitBreakerTest(ClockTestCase):
+
+    def open_breaker(self):
+        breaker = CircuitBreaker("departures", failure_threshold=3,
+                                 reset_timeout=30)
+        for _ in range(3):
+            self.assertEqual(breaker.before_call(), False)
+            breaker.failed()
+        return breaker
+
+    def test_opens_after_threshold(self):
+        breaker = CircuitBreaker("departures", failure_threshold=3)
+        breaker.failed()
+        breaker.failed()
+        breaker.succeeded()  # not in a row
+        breaker.failed()
+        breaker.failed()
+        self.assertEqual(breaker.state, CLOSED)
+        breaker.failed()
+        self.assertEqual(breaker.state, OPEN)
+
+    def test_open_refuses_calls(self):
+        breaker = self.open_breaker()
+        self.clock.now += 10
+        try:
+            breaker.before_call()
+        except CircuitOpenError as e:
+            self.assertEqual(e.family, "departures")
+            self.assertAlmostEqual(e.retry_in, 20)
+        else:
+            self.fail("call let through an open circuit")
+
+    def test_one_trial_when_half_open(self):
+        breaker = self.open_breaker()
+        self.clock.now += 30
+        self.assertEqual(breaker.before_call(), True)
+        self.assertEqual(breaker.state, HALF_OPEN)
+        self.assertRaises(CircuitOpenError, breaker.before_call)
+
+    def test_trial_success_closes(self):
+        breaker = self.open_breaker()
+        self.clock.now += 30
+        breaker.before_call()
+        breaker.succeeded()
+        self.assertEqual(breaker.state, CLOSED)
+        self.assertEqual(breaker.failures, 0)
+        self.assertEqual(breaker.before_call(), False)
+
+    def test_trial_failure_reopens(self):
+        breaker = self.open_breaker()
+        self.clock.now += 30
+        breaker.before_call()
+        breaker.failed()
+        self.assertEqual(breaker.state, OPEN)
+        self.assertEqual(breaker.opened_at, self.clock.now)
+        self.assertRaises(CircuitOpenError, breaker.before_call)
+        self.clock.now += 30
+        self.assertEqual(breaker.before_call(), True)
+
+    def test_release_leaves_state(self):
+        breaker = self.open_breaker()
+        self.clock.now += 30
+        breaker.before_call()
+        breaker.release()
+        self.assertEqual(breaker.state, HALF_OPEN)
+        self.assertEqual(breaker.before_call(), True)
+
+
+class ResilienceTest(ClockTestCase):
+
+    def half_open(self, r):
+        try:
+            r.call("stopping_pattern", fails(IOError("down")))
+        except IOError:
+            pass
+        breaker = r.breaker("departures")
+        self.assertEqual(breaker.state, OPEN)
+        self.clock.now += r.reset_timeout
+        return breaker
+
+    def test_retries_then_opens(self):
+        r = Resilience(attempts=3, failure_threshold=1, reset_timeout=30)
+        self.assertRaises(IOError, r.call, "broad_next_departures",
+                          fails(IOError("down")))
+        self.assertEqual(r.retries, 2)
+        self.assertRaises(CircuitOpenError, r.call, "specific_next_departures",
+                          ok)
+        self.assertEqual(r.short_circuits, 1)
+        self.assertEqual(r.stats()["circuits"], {"departures": OPEN})
+
+    def test_non_retryable_isnt_retried(self):
+        r = Resilience(attempts=3, failure_threshold=1)
+        self.assertRaises(APIError, r.call, "broad_next_departures",
+                          fails(APIError("forbidden", status=403)))
+        self.assertEqual(r.retries, 0)
+        self.assertEqual(r.breaker("departures").state, CLOSED)
+
+    def test_trial_success_closes(self):
+        r = Resilience(attempts=1, failure_threshold=1, reset_timeout=30)
+        breaker = self.half_open(r)
+        self.assertEqual(r.call("broad_next_departures", ok), "ok")
+        self.assertEqual(breaker.state, CLOSED)
+
+    def test_non_retryable_trial_stays_half_open(self):
+        r = Resilience(attempts=1, failure_threshold=1, reset_timeout=30)
+        breaker = self.half_open(r)
+        self.assertRaises(APIError, r.call, "broad_next_departures",
+                          fails(APIError("forbidden", status=403)))
+        # says nothing about the API, so the next call is another trial
+        self.assertEqual(breaker.state, HALF_OPEN)
+        self.assertEqual(breaker.before_call(), True)
+
+    def test_interrupted_trial_is_released(self):
+        r = Resilience(attempts=1, failure_threshold=1, reset_timeout=30)
+        breaker = self.half_open(r)
+        self.assertRaises(KeyboardInterrupt, r.call, "broad_next_departures",
+                          fails(KeyboardInterrupt()))
+        self.assertEqual(breaker.state, HALF_OPEN)
+        self.assertEqual(r.call("broad_next_departures", ok), "ok")
+        self.assertEqual(breaker.state, CLOSED)
+
+    def test_client_serves_stale_when_open(self):
+        client = replay_client({}, cache=ResponseCache(ttls={"search": 60}),
+                               resilience=Resilience(attempts=2,
+                                                     failure_threshold=1))
+        client.transport.fixtures["/v2/search/Sydney%20Rd"] = "[]"
+        self.assertEqual(client.search("Sydney Rd"), [])
+
+        # the API starts answering with error pages
+        client.transport.fixtures["/v2/search/Sydney%20Rd"] = "<html>"
+        self.clock.now += 61
+        requests = client.transport.requests
+        self.assertEqual(client.search("Sydney Rd"), [])
+        self.assertEqual(client.transport.requests, requests + 2)
+        self.assertEqual(client.resilience.stats()["circuits"],
+                         {"search": OPEN})
+
+        # open now, so nothing is sent
+        self.assertEqual(client.search("Sydney Rd"), [])
+        self.assertEqual(client.transport.requests, requests + 2)
+        self.assertEqual(client.resilience.stale_served, 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,90 @@
+import random
+import unittest
+
+from pyptv.client import NEARME_PATH
+from pyptv.location import haversine
+from pyptv.spatial import StopIndex
+
+from tests.fixtures import replay_client, stop
+
+
+def brute_force(stops, lat, lon, mode=None):
+    """ (stop, distance) for every stop, nearest first """
+    out = [(haversine(lat, lon, s.location.lat, s.location.lon), s)
+           for s in stops if mode is None or s.transport_type == mode]
+    out.sort(key=lambda entry: entry[0])
+    return [(s, distance) for distance, s in out]
+
+
+class StopIndexTest(unittest.TestCase):
+
+    def setUp(self):
+        rand = random.Random(1)
+        self.centre = (-37.81, 144.96)
+        responses = [{"type": "stop",
+                      "result": stop(i, -37.81 + rand.uniform(-0.2, 0.2),
+                                     144.96 + rand.uniform(-0.3, 0.3),
+                                     mode=rand.choice(("tram", "bus")))}
+                     for i in range(400)]
+        self.client = replay_client(
+            {NEARME_PATH.render(*self.centre): responses})
+
+        self.stops = self.client.stops_nearby(self.centre)
+        self.assertEqual(len(self.stops), 400)
+        self.index = StopIndex(self.stops)
+
+        # inside the grid, on cell edges and well outside of it
+        self.queries = [(-37.81 + rand.uniform(-0.3, 0.3),
+                         144.96 + rand.uniform(-0.4, 0.4))
+                        for _ in range(40)]
+        self.queries += [(-37.8, 144.95), (-37.5, 145.5), (-38.5, 144.0)]
+
+    def assertMatches(self, got, want):
+        self.assertEqual([s.stop_id for s, _ in got],
+                         [s.stop_id for s, _ in want])
+        for (_, a), (_, b) in zip(got, want):
+            self.assertAlmostEqual(a, b)
+
+    def test_nearest(self):
+        for lat, lon in self.queries:
+            for k in (1, 5, 30):
+                self.assertMatches(self.index.nearest((lat, lon), k=k),
+                                   brute_force(self.stops, lat, lon)[:k])
+
+    def test_nearest_by_mode(self):
+        for lat, lon in self.queries:
+            self.assertMatches(
+                self.index.nearest((lat, lon), k=10, mode="bus"),
+                brute_force(self.stops, lat, lon, mode="bus")[:10])
+
+    def test_nearest_within_distance(self):
+        for lat, lon in self.queries:
+            want = [(s, d) for s, d in brute_force(self.stops, lat, lon)
+                    if d <= 2.0][:20]
+            self.assertMatches(
+                self.index.nearest((lat, lon), k=20, max_distance=2.0), want)
+
+    def test_within(self):
+        for lat, lon in self.queries:
+            want = [(s, d) for s, d in brute_force(self.stops, lat, lon)
+                    if d <= 1.5]
+            self.assertMatches(self.index.within((lat, lon), 1.5), want)
+
+    def test_more_than_there_are(self):
+        lat, lon = self.centre
+        self.assertMatches(self.index.nearest((lat, lon), k=1000),
+                           brute_force(self.stops, lat, lon))
+
+    def test_client_answers_from_index(self):
+        self.client.stop_index = self.index
+        requests = self.client.transport.requests
+
+        lat, lon = self.queries[0]
+        got = self.client.stops_nearby((lat, lon), limit=5,
+                                       with_distance=True)
+        self.assertMatches(got, brute_force(self.stops, lat, lon)[:5])
+        self.assertEqual(self.client.transport.requests, requests)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,70 @@
+from datetime import datetime, timedelta
+import unittest
+
+from pyptv import utils
+from pyptv.utils import (AU_MEL, UTC, TIMESTAMP_FORMAT, parse_datetime_tz,
+                         parse_datetimes_tz, parse_epoch)
+
+
+def reference(raw):
+    """ what parse_datetime_tz used to do, with strptime & pytz """
+    dt = datetime.strptime(raw, TIMESTAMP_FORMAT)
+    return UTC.localize(dt).astimezone(AU_MEL)
+
+
+def timestamps(start, hours, step=timedelta(minutes=7, seconds=13)):
+    when = start
+    end = start + timedelta(hours=hours)
+    while when < end:
+        yield when.strftime(TIMESTAMP_FORMAT)
+        when += step
+
+
+class ParseDatetimeTest(unittest.TestCase):
+
+    def setUp(self):
+        utils._offsets.clear()
+
+    def assertSame(self, raw):
+        got = parse_datetime_tz(raw)
+        want = reference(raw)
+        self.assertEqual(got, want, raw)
+        # the same wall clock time & offset, not just the same instant
+        self.assertEqual(got.replace(tzinfo=None), want.replace(tzinfo=None),
+                         raw)
+        self.assertEqual(got.utcoffset(), want.utcoffset(), raw)
+        self.assertEqual(got.tzname(), want.tzname(), raw)
+
+    def test_around_daylight_saving_ending(self):
+        # 3am AEDT on 5 April 2015 is 2am AEST, 16:00 UTC the day before
+        for raw in timestamps(datetime(2015, 4, 4, 10), 12):
+            self.assertSame(raw)
+
+    def test_around_daylight_saving_starting(self):
+        # 2am AEST on 4 October 2015 is 3am AEDT, 16:00 UTC the day before
+        for raw in timestamps(datetime(2015, 10, 3, 10), 12):
+            self.assertSame(raw)
+
+    def test_across_years(self):
+        for raw in timestamps(datetime(2014, 1, 1), 24 * 365 * 2,
+                              step=timedelta(hours=5, minutes=17)):
+            self.assertSame(raw)
+
+    def test_odd_formats_fall_back_to_strptime(self):
+        self.assertSame("2015-6-4T05:00:00Z")
+        self.assertRaises(ValueError, parse_datetime_tz, "2015-06-04 05:00")
+        self.assertRaises(ValueError, parse_datetime_tz,
+                          "2015-13-04T05:00:00Z")
+
+    def test_many(self):
+        raws = ["2015-06-04T05:00:00Z", None, "2015-12-04T05:00:00Z"]
+        self.assertEqual(parse_datetimes_tz(raws),
+                         [reference(raws[0]), None, reference(raws[2])])
+
+    def test_epoch(self):
+        raw = "2015-06-04T05:00:00Z"
+        self.assertEqual(parse_epoch(raw), 1433394000)
+
+
+if __name__ == '__main__':
+    unittest.main()